@@ -0,0 +1,379 @@
+"""Headless solver, for generating crosswords in bulk without the GUI.
+
+Every run is written to the output as a single JSON line, containing the solved grid and the statistics of the run.
+With more than one worker, runs with different seeds and noise levels race each other in separate processes, until enough solutions are found.
+With --split, the search tree itself is split into disjoint subtrees searched by the workers, which covers the whole tree, e.g. to find out if any solution exists.
+
+Example:
+    python batch.py dictionary_HU.txt --size 5x5 --letterset hu --runs 10 --seed 1 --time-limit 60
+    python batch.py dictionary_HU.txt --size 8x8 --letterset hu --runs 1000 --workers 32 --solutions 1 --noise 0 1 10
+    python batch.py dictionary_HU.txt --size 8x8 --letterset hu --workers 32 --split 1000
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+
+import crossword
+import dictionary
+from metrics import Metrics, printEvent
+from solver import WFCSolver
+
+letterSets = {"hu": dictionary.lettersetHU, "en": dictionary.lettersetEN}
+
+def parseCoords(text):
+    """Parses coordinates in "x,y" format.
+
+    Arguments:
+        text (string): Coordinates to parse.
+
+    Returns:
+        (tuple): Coordinates of the cell.
+    """
+    x, y = text.split(",")
+    return (int(x), int(y))
+
+def parseLetter(text):
+    """Parses a letter in "x,y,letter" format.
+
+    Arguments:
+        text (string): Coordinates and letter to parse.
+
+    Returns:
+        (tuple): Coordinates of the cell and the letter.
+    """
+    x, y, letter = text.split(",")
+    return (int(x), int(y)), letter.lower()
+
+def readLayout(filename):
+    """Reads a layout file. Every line is a row of the grid: "#" is a blocked cell, "." is an empty cell, any other character is a fixed letter.
+
+    Arguments:
+        filename (string): Filename of the layout.
+
+    Returns:
+        size (tuple): Width and height of the grid.
+        blocked (list of tuples): Coordinates of the blocked cells.
+        letters (dict): Letter for the coordinates of each fixed cell.
+    """
+    with open(filename, encoding="utf-8") as f:
+        rows = [line.strip() for line in f if line.strip()]
+
+    blocked = []
+    letters = {}
+    for y, row in enumerate(rows):
+        for x, character in enumerate(row):
+            if character == "#":
+                blocked.append((x, y))
+            elif character != ".":
+                letters[(x, y)] = character.lower()
+    return (max(len(row) for row in rows), len(rows)), blocked, letters
+
+def gridRows(grid):
+    """Converts the grid to text rows, in the same format as the layout files. Undefined cells are ".".
+
+    Arguments:
+        grid (Grid): Grid to convert.
+
+    Returns:
+        (list of strings): Rows of the grid.
+    """
+    rows = []
+    for y in range(grid.height):
+        row = ""
+        for x in range(grid.width):
+            cell = grid[(x, y)]
+            if cell.blocked:
+                row += "#"
+            elif cell.isDefined():
+                row += cell.getDefined()
+            else:
+                row += "."
+        rows.append(row)
+    return rows
+
+def logEvent(name, fields):
+    """Prints an event of the solver to stderr, as stdout is reserved for the results.
+
+    Arguments:
+        name (str): Name of the event.
+        fields (dict): Details of the event.
+    """
+    printEvent(name, fields, file=sys.stderr)
+
+def solveOnce(wordDictionary, size, blocked, letters, seed, timeLimit=None, maxIterations=None, storage="compact", deadline=None, symmetric=False, **solverOptions):
+    """Solves a single crossword.
+
+    Arguments:
+        wordDictionary (Dictionary): Valid words.
+        size (tuple): Width and height of the grid.
+        blocked (list of tuples): Coordinates of the blocked cells.
+        letters (dict): Letter for the coordinates of each fixed cell.
+        seed (int): Seed of the random choices.
+        timeLimit (float) - optional: Maximum runtime in seconds. (Default: No limit)
+        maxIterations (int) - optional: Maximum number of iterations. (Default: No limit)
+        storage (str) - optional: Storage of the cell options, see Grid. (Default: "compact")
+        deadline (float) - optional: Wall-clock time to stop at, as returned by time.time(). (Default: No limit)
+        symmetric (bool) - optional: If True, every row reads the same as the column with the same index, see Crossword. (Default: False)
+        solverOptions - optional: Keyword arguments of WFCSolver, e.g. noise, prefix or learning. The crossword is solved in place, unless trail is False. With trace, the events are printed to stderr.
+
+    Returns:
+        (dict): Result and statistics of the run.
+    """
+    random.seed(seed)
+    startTime = time.perf_counter()
+    solverOptions.setdefault("trail", True)
+    if solverOptions.pop("trace", False):
+        solverOptions["metrics"] = Metrics()
+        solverOptions["metrics"].addListener(logEvent)
+
+    rootCrossword = crossword.Crossword(size, wordDictionary, storage, symmetric)
+    rootCrossword.setLayout(blocked, letters)
+    solver = WFCSolver(rootCrossword, **solverOptions)
+    solved = solver.solve(timeLimit=timeLimit, maxIterations=maxIterations, deadline=deadline)
+
+    grid = solver.currentNode.crossword.grid
+    return {
+        "seed": seed,
+        "noise": solver.noise,
+        "prefix": [[x, y, letter] for (x, y), letter in solver.prefix],
+        "solved": solved,
+        "exhausted": not solved and solver.isExhausted(),
+        "grid": gridRows(grid) if solved else None,
+        "words": grid.allWords() if solved else None,
+        "iterations": solver.i,
+        "backtracks": solver.backtracks,
+        "backjumps": solver.backjumps,
+        "restarts": solver.restartCount,
+        "updates": solver.totalUpdates,
+        "time": time.perf_counter() - startTime,
+        "metrics": solver.metrics.stats(),
+    }
+
+def solveSequential(wordDictionary, size, blocked, letters, seeds, noises=(None,), solutions=None, timeLimit=None, maxIterations=None, storage="compact", deadline=None, symmetric=False, **solverOptions):
+    """Same as solvePortfolio, but the runs are done one after the other in this process.
+    """
+    found = set()
+    for i, seed in enumerate(seeds):
+        result = solveOnce(wordDictionary, size, blocked, letters, seed, timeLimit, maxIterations, storage, deadline, symmetric, noise=noises[i % len(noises)], **solverOptions)
+        yield result
+        if result["solved"]:
+            found.add(tuple(result["grid"]))
+            if solutions is not None and len(found) >= solutions:
+                break
+
+# Dictionary of a worker process, set once when the worker starts
+workerDictionary = None
+
+def initWorker(wordDictionary):
+    """Prepares a worker process of the portfolio.
+
+    Arguments:
+        wordDictionary (Dictionary): Valid words.
+    """
+    global workerDictionary
+    workerDictionary = wordDictionary
+
+def solveJob(job):
+    """Solves a single crossword in a worker process.
+
+    Arguments:
+        job (tuple): Arguments of solveOnce except the dictionary, followed by the solver options.
+
+    Returns:
+        (dict): Result and statistics of the run.
+    """
+    *arguments, solverOptions = job
+    return solveOnce(workerDictionary, *arguments, **solverOptions)
+
+def solvePortfolio(wordDictionary, size, blocked, letters, seeds, noises=(None,), workers=None, solutions=1, timeLimit=None, maxIterations=None, storage="compact", deadline=None, symmetric=False, **solverOptions):
+    """Races runs with different seeds and noise levels in a pool of processes. Yields the result of every finished run, and stops the remaining runs once enough distinct solutions are found.
+
+    Arguments:
+        wordDictionary (Dictionary): Valid words.
+        size (tuple): Width and height of the grid.
+        blocked (list of tuples): Coordinates of the blocked cells.
+        letters (dict): Letter for the coordinates of each fixed cell.
+        seeds (iterable of ints): Seed of each run.
+        noises (list of floats) - optional: Noise levels, assigned to the runs in turns. (Default: No noise)
+        workers (int) - optional: Number of processes. (Default: Number of CPUs)
+        solutions (int) - optional: Number of distinct solutions to find, None to finish every run. (Default: 1)
+        timeLimit (float) - optional: Maximum runtime of each run in seconds. (Default: No limit)
+        maxIterations (int) - optional: Maximum number of iterations of each run. (Default: No limit)
+        storage (str) - optional: Storage of the cell options, see Grid. (Default: "compact")
+        deadline (float) - optional: Wall-clock time to stop every run at, as returned by time.time(). (Default: No limit)
+        symmetric (bool) - optional: If True, every row reads the same as the column with the same index, see Crossword. (Default: False)
+        solverOptions - optional: Keyword arguments of WFCSolver, see solveOnce.
+    """
+    jobs = [(size, blocked, letters, seed, timeLimit, maxIterations, storage, deadline, symmetric, dict(solverOptions, noise=noises[i % len(noises)])) for i, seed in enumerate(seeds)]
+    return runPool(wordDictionary, jobs, workers, solutions)
+
+def solveSplit(wordDictionary, size, blocked, letters, subtrees, seed=0, workers=None, solutions=1, timeLimit=None, maxIterations=None, storage="compact", deadline=None, symmetric=False, **solverOptions):
+    """Splits the search tree into disjoint subtrees, and searches them in a pool of processes. Yields the result of every finished subtree, and stops the remaining ones once enough distinct solutions are found.
+    If no run is solved and every run is exhausted, the crossword has no solution.
+
+    Arguments:
+        subtrees (int): Minimum number of subtrees, see WFCSolver.splitFrontier. More subtrees than workers keep every worker busy, as idle workers pick up the next subtree.
+        seed (int) - optional: Seed of the random choices, used for every subtree. (Default: 0)
+
+    See solvePortfolio for the rest of the arguments.
+    """
+    random.seed(seed)
+    rootCrossword = crossword.Crossword(size, wordDictionary, storage, symmetric)
+    rootCrossword.setLayout(blocked, letters)
+    frontier = WFCSolver(rootCrossword, trail=solverOptions.get("trail", True), noise=solverOptions.get("noise")).splitFrontier(subtrees)
+
+    jobs = [(size, blocked, letters, seed, timeLimit, maxIterations, storage, deadline, symmetric, dict(solverOptions, prefix=prefix)) for prefix in frontier]
+    return runPool(wordDictionary, jobs, workers, solutions)
+
+def runPool(wordDictionary, jobs, workers=None, solutions=1):
+    """Runs solveOnce for every job in a pool of processes. Yields the result of every finished job, and stops the remaining jobs once enough distinct solutions are found.
+
+    Arguments:
+        wordDictionary (Dictionary): Valid words.
+        jobs (list of tuples): Arguments of solveOnce except the dictionary, followed by the solver options.
+        workers (int) - optional: Number of processes. (Default: Number of CPUs)
+        solutions (int) - optional: Number of distinct solutions to find, None to finish every job. (Default: 1)
+    """
+    found = set()
+
+    with tempfile.TemporaryDirectory() as exportDirectory:
+        # Workers attach to a memory mapped export of the dictionary, instead of receiving a copy each
+        if wordDictionary.attachedFile is None:
+            exportFile = os.path.join(exportDirectory, "dictionary.bin")
+            wordDictionary.export(exportFile)
+            cacheLimits = wordDictionary.frequencyCache.limits() if wordDictionary.frequencyCache is not None else None
+            wordDictionary = dictionary.Dictionary.attach(exportFile, cacheLimits)
+
+        pool = multiprocessing.Pool(workers, initializer=initWorker, initargs=(wordDictionary,))
+        try:
+            # Jobs are handed out one by one, so idle workers pick up the next one
+            for result in pool.imap_unordered(solveJob, jobs, chunksize=1):
+                yield result
+                if result["solved"]:
+                    found.add(tuple(result["grid"]))
+                    if solutions is not None and len(found) >= solutions:
+                        break
+        finally:
+            # Cancel the jobs that are still going
+            pool.terminate()
+            pool.join()
+
+def parseArguments(arguments=None):
+    """Parses the command line arguments.
+
+    Arguments:
+        arguments (list of strings) - optional: Arguments to parse. (Default: sys.argv)
+
+    Returns:
+        (Namespace): Parsed options.
+    """
+    parser = argparse.ArgumentParser(description="Solve crosswords without the GUI, writing the results as JSON lines.")
+    parser.add_argument("dictionary", help="file containing the list of valid words, or a dictionary written by --export")
+    parser.add_argument("--letterset", choices=sorted(letterSets), help="only keep words made up of these letters")
+    parser.add_argument("--max-length", type=int, help="only keep words up to this length")
+    parser.add_argument("--cache", action="store_true", help="cache the prepared dictionary next to the word list")
+    parser.add_argument("--export", metavar="FILE", help="write the prepared dictionary as a memory mappable file and exit")
+    parser.add_argument("--frequency-cache", type=float, default=64, metavar="MB", help="memory of the letter frequencies cached by each run, 0 to disable")
+    parser.add_argument("--size", help="size of the grid as WIDTHxHEIGHT, required without a layout")
+    parser.add_argument("--layout", help="file with one line per row: '#' blocked, '.' empty, anything else a fixed letter")
+    parser.add_argument("--blocked", action="append", default=[], type=parseCoords, metavar="X,Y", help="block a cell, can be repeated")
+    parser.add_argument("--letter", action="append", default=[], type=parseLetter, metavar="X,Y,LETTER", help="fix a letter, can be repeated")
+    parser.add_argument("--runs", type=int, default=1, help="number of crosswords to solve")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the first run, the following runs use the next seeds")
+    parser.add_argument("--time-limit", type=float, help="maximum time per run in seconds")
+    parser.add_argument("--deadline", type=float, help="stop every run this many seconds after the start of the batch")
+    parser.add_argument("--max-iterations", type=int, help="maximum number of iterations per run")
+    parser.add_argument("--storage", choices=["dict", "compact", "numpy"], default="compact", help="storage of the cell options")
+    parser.add_argument("--copy", action="store_true", help="copy the crossword for every move, instead of solving in place")
+    parser.add_argument("--symmetric", action="store_true", help="solve a square grid whose rows read the same as its columns")
+    parser.add_argument("--engine", choices=["letter", "word"], default="letter", help="decide a letter of a cell or a whole word of a slot in every move")
+    parser.add_argument("--learn", action="store_true", help="jump back to the decisions causing deadends, and learn nogoods from them")
+    parser.add_argument("--restarts", choices=["luby", "geometric"], help="start over from the root after a growing number of backtracks")
+    parser.add_argument("--restart-base", type=int, default=100, help="number of backtracks before the first restart")
+    parser.add_argument("--noise", type=float, nargs="+", default=[None], help="noise levels of the entropies, assigned to the runs in turns")
+    parser.add_argument("--workers", type=int, default=1, help="number of processes racing the runs, 0 for one per CPU")
+    parser.add_argument("--split", type=int, metavar="SUBTREES", help="split the search tree into at least this many disjoint subtrees for the workers, instead of racing runs")
+    parser.add_argument("--solutions", type=int, help="stop after this many distinct solutions (default: finish every run)")
+    parser.add_argument("--format", choices=["ndjson", "json"], default="ndjson", help="a JSON line per run, or a single JSON list at the end")
+    parser.add_argument("--trace", action="store_true", help="log every move and update of the solver on stderr")
+    parser.add_argument("--metrics", metavar="FILE", help="write the metrics of every run combined to this file")
+    parser.add_argument("--metrics-format", choices=["json", "prometheus"], default="json", help="format of the metrics file")
+    options = parser.parse_args(arguments)
+
+    if options.layout is None and options.size is None and options.export is None:
+        parser.error("either --size or --layout is required")
+    return options
+
+def main(arguments=None):
+    """Solves the crosswords described by the command line arguments, and writes the results to stdout.
+
+    Arguments:
+        arguments (list of strings) - optional: Command line arguments. (Default: sys.argv)
+    """
+    options = parseArguments(arguments)
+
+    if dictionary.isExported(options.dictionary):
+        wordDictionary = dictionary.Dictionary.attach(options.dictionary)
+    else:
+        wordDictionary = dictionary.Dictionary(options.dictionary, maxLength=options.max_length, validLetters=letterSets.get(options.letterset), cache=options.cache)
+
+    if options.export is not None:
+        wordDictionary.export(options.export)
+        return
+
+    if options.frequency_cache > 0:
+        wordDictionary.enableFrequencyCache(maxBytes=int(options.frequency_cache * 2**20))
+
+    blocked = list(options.blocked)
+    letters = dict(options.letter)
+    if options.layout is not None:
+        size, layoutBlocked, layoutLetters = readLayout(options.layout)
+        blocked += layoutBlocked
+        letters.update(layoutLetters)
+    if options.size is not None:
+        width, height = options.size.lower().split("x")
+        size = (int(width), int(height))
+
+    if options.symmetric and size[0] != size[1]:
+        raise SystemExit("A symmetric grid has to be square, not %dx%d" % size)
+
+    for coords, letter in letters.items():
+        if letter not in wordDictionary.letters:
+            raise SystemExit("Letter %r at %s does not appear in the dictionary" % (letter, coords))
+
+    seeds = range(options.seed, options.seed + options.runs)
+    deadline = time.time() + options.deadline if options.deadline is not None else None
+    solverOptions = {"trail": not options.copy, "engine": options.engine, "learning": options.learn, "restarts": options.restarts, "restartBase": options.restart_base, "trace": options.trace}
+    if options.split is not None:
+        results = solveSplit(wordDictionary, size, blocked, letters, options.split, options.seed, options.workers or None, options.solutions,
+                             options.time_limit, options.max_iterations, options.storage, deadline, symmetric=options.symmetric, noise=options.noise[0], **solverOptions)
+    elif options.workers == 1:
+        results = solveSequential(wordDictionary, size, blocked, letters, seeds, options.noise, options.solutions,
+                                  options.time_limit, options.max_iterations, options.storage, deadline, symmetric=options.symmetric, **solverOptions)
+    else:
+        results = solvePortfolio(wordDictionary, size, blocked, letters, seeds, options.noise, options.workers or None, options.solutions,
+                                 options.time_limit, options.max_iterations, options.storage, deadline, symmetric=options.symmetric, **solverOptions)
+
+    finished = []
+    totals = Metrics()
+    for run, result in enumerate(results):
+        result["run"] = run
+        totals.merge(result["metrics"])
+        if options.format == "ndjson":
+            print(json.dumps(result, ensure_ascii=False), flush=True)
+        else:
+            finished.append(result)
+
+    if options.format == "json":
+        print(json.dumps(finished, ensure_ascii=False, indent=2))
+
+    if options.metrics is not None:
+        totals.write(options.metrics, options.metrics_format)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+"""Benchmark of the solver on seeded synthetic dictionaries.
+
+Every case of the matrix (grid size and layout) is solved with a few fixed seeds. The time to solution, iterations, backtracks and peak memory are reported, and saved as JSON.
+A previous result can be given as a baseline, the median times are compared case by case.
+
+Example:
+    python benchmark.py --output before.json
+    python benchmark.py --output after.json --baseline before.json
+    python benchmark.py --letterset hu --words 50000 --lengths 3-8 --sizes 5x5 6x6 --layouts open bars --seeds 0 1 2 3 4
+"""
+import argparse
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+
+import batch
+import dictionary
+
+def blockedCells(layout, size):
+    """Returns the blocked cells of a layout.
+
+    Arguments:
+        layout (str): "open" without blocked cells, "bars" with a blocked column in the middle, or "checker" with every other cell of the odd rows blocked.
+        size (tuple): Width and height of the grid.
+
+    Returns:
+        (list of tuples): Coordinates of the blocked cells.
+    """
+    width, height = size
+    if layout == "open":
+        return []
+    if layout == "bars":
+        return [(width // 2, y) for y in range(height)]
+    if layout == "checker":
+        return [(x, y) for y in range(1, height, 2) for x in range(1, width, 2)]
+    raise ValueError("Unknown layout: %s" % layout)
+
+def syntheticWords(count, letters, lengths, seed, skew=1.0):
+    """Generates random words. Letters are drawn with Zipf-like frequencies, so some letters are common and some are rare, like in a real language.
+
+    Arguments:
+        count (int): Number of words to generate, duplicates are generated again.
+        letters (str): Alphabet of the words.
+        lengths (list of ints): Possible lengths of the words, drawn uniformly.
+        seed (int): Seed of the generator, the same seed always generates the same words.
+        skew (float) - optional: Exponent of the letter frequencies, 0 for uniform letters. (Default: 1.0)
+
+    Returns:
+        (list of strings): Generated words.
+    """
+    generator = random.Random(seed)
+    # Letters are shuffled, so the frequent ones are not always at the start of the alphabet
+    letters = list(letters)
+    generator.shuffle(letters)
+    weights = [1 / (rank + 1) ** skew for rank in range(len(letters))]
+
+    words = set()
+    while len(words) < count:
+        length = generator.choice(lengths)
+        words.add(''.join(generator.choices(letters, weights, k=length)))
+    return sorted(words)
+
+def parseSize(text):
+    """Parses a grid size in "WIDTHxHEIGHT" format.
+
+    Arguments:
+        text (str): Size to parse.
+
+    Returns:
+        (tuple): Width and height.
+    """
+    width, height = text.lower().split("x")
+    return (int(width), int(height))
+
+def parseLengths(text):
+    """Parses word lengths, as a range "3-6" or a single length "5".
+
+    Arguments:
+        text (str): Lengths to parse.
+
+    Returns:
+        (list of ints): Word lengths.
+    """
+    first, _, last = text.partition("-")
+    return list(range(int(first), int(last or first) + 1))
+
+def runCase(wordDictionary, size, layout, seeds, timeLimit=None, storage="compact", memory=True, symmetric=False, **solverOptions):
+    """Solves a case of the matrix with every seed.
+
+    Arguments:
+        wordDictionary (Dictionary): Valid words.
+        size (tuple): Width and height of the grid.
+        layout (str): Layout of the blocked cells, see blockedCells.
+        seeds (list of ints): Seed of each run.
+        timeLimit (float) - optional: Maximum runtime of each run in seconds. (Default: No limit)
+        storage (str) - optional: Storage of the cell options, see Grid. (Default: "compact")
+        memory (bool) - optional: If True, every run is repeated to measure its peak memory, which would slow down the timed run. (Default: True)
+        symmetric (bool) - optional: If True, rows read the same as columns, see Crossword. (Default: False)
+        solverOptions - optional: Keyword arguments of WFCSolver, see batch.solveOnce.
+
+    Returns:
+        (dict): Results of every run and their summary.
+    """
+    blocked = blockedCells(layout, size)
+    runs = []
+    for seed in seeds:
+        # Every run starts cold, so the order of the runs doesn't matter
+        if wordDictionary.frequencyCache is not None:
+            wordDictionary.frequencyCache.clear()
+        result = batch.solveOnce(wordDictionary, size, blocked, {}, seed, timeLimit, storage=storage, symmetric=symmetric, **solverOptions)
+        run = {key: result[key] for key in ("seed", "solved", "exhausted", "iterations", "backtracks", "time")}
+        if memory:
+            if wordDictionary.frequencyCache is not None:
+                wordDictionary.frequencyCache.clear()
+            tracemalloc.start()
+            batch.solveOnce(wordDictionary, size, blocked, {}, seed, timeLimit, storage=storage, symmetric=symmetric, **solverOptions)
+            run["peakMemory"] = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        runs.append(run)
+
+    summary = {
+        "solved": sum(run["solved"] for run in runs),
+        "medianTime": statistics.median(run["time"] for run in runs),
+        "medianIterations": statistics.median(run["iterations"] for run in runs),
+        "medianBacktracks": statistics.median(run["backtracks"] for run in runs),
+    }
+    if memory:
+        summary["maxPeakMemory"] = max(run["peakMemory"] for run in runs)
+    return {"size": list(size), "layout": layout, "summary": summary, "runs": runs}
+
+def caseName(case):
+    """Returns the name of a case, e.g. "5x5/open".
+
+    Arguments:
+        case (dict): Case returned by runCase.
+
+    Returns:
+        (str): Name of the case.
+    """
+    return "%dx%d/%s" % (case["size"][0], case["size"][1], case["layout"])
+
+def compare(results, baseline, threshold=1.1):
+    """Compares the median times of every case to a baseline.
+
+    Arguments:
+        results (dict): Benchmark results.
+        baseline (dict): Earlier benchmark results.
+        threshold (float) - optional: Ratio of the times above which a case counts as a regression. (Default: 1.1)
+
+    Returns:
+        comparison (list of tuples): Name, baseline time, new time and ratio of every case in both results.
+        regressions (list of strings): Names of the cases slower than the threshold.
+    """
+    baselineCases = {caseName(case): case for case in baseline["cases"]}
+    comparison = []
+    regressions = []
+    for case in results["cases"]:
+        name = caseName(case)
+        if name not in baselineCases:
+            continue
+        before = baselineCases[name]["summary"]["medianTime"]
+        after = case["summary"]["medianTime"]
+        ratio = after / before if before > 0 else float("inf")
+        comparison.append((name, before, after, ratio))
+        if ratio > threshold:
+            regressions.append(name)
+    return comparison, regressions
+
+def parseArguments(arguments=None):
+    """Parses the command line arguments.
+
+    Arguments:
+        arguments (list of strings) - optional: Arguments to parse. (Default: sys.argv)
+
+    Returns:
+        (Namespace): Parsed options.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark the solver on seeded synthetic dictionaries.")
+    parser.add_argument("--dictionary", help="use this word list instead of a synthetic dictionary")
+    parser.add_argument("--letterset", choices=sorted(batch.letterSets), default="en", help="alphabet of the synthetic dictionary")
+    parser.add_argument("--words", type=int, default=20000, help="number of words in the synthetic dictionary")
+    parser.add_argument("--lengths", type=parseLengths, default=parseLengths("3-6"), help="word lengths of the synthetic dictionary, e.g. 3-6")
+    parser.add_argument("--skew", type=float, default=1.0, help="exponent of the letter frequencies, 0 for uniform letters")
+    parser.add_argument("--dictionary-seed", type=int, default=0, help="seed of the synthetic dictionary")
+    parser.add_argument("--sizes", type=parseSize, nargs="+", default=[(4, 4), (5, 5), (6, 6)], help="grid sizes as WIDTHxHEIGHT")
+    parser.add_argument("--layouts", choices=["open", "bars", "checker"], nargs="+", default=["open", "bars", "checker"], help="layouts of the blocked cells")
+    parser.add_argument("--seeds", type=int, nargs="+", default=[0, 1, 2], help="seeds of the runs of every case")
+    parser.add_argument("--time-limit", type=float, default=30, help="maximum time per run in seconds")
+    parser.add_argument("--storage", choices=["dict", "compact", "numpy"], default="compact", help="storage of the cell options")
+    parser.add_argument("--frequency-cache", type=float, default=64, metavar="MB", help="memory of the cached letter frequencies, 0 to disable")
+    parser.add_argument("--copy", action="store_true", help="copy the crossword for every move, instead of solving in place")
+    parser.add_argument("--symmetric", action="store_true", help="solve square grids whose rows read the same as their columns")
+    parser.add_argument("--engine", choices=["letter", "word"], default="letter", help="decide a letter of a cell or a whole word of a slot in every move")
+    parser.add_argument("--learn", action="store_true", help="jump back to the decisions causing deadends, and learn nogoods from them")
+    parser.add_argument("--restarts", choices=["luby", "geometric"], help="start over from the root after a growing number of backtracks")
+    parser.add_argument("--no-memory", action="store_true", help="skip measuring the peak memory, which runs every case twice")
+    parser.add_argument("--output", help="save the results as JSON")
+    parser.add_argument("--baseline", help="compare the median times to these earlier results")
+    parser.add_argument("--threshold", type=float, default=1.1, help="time ratio above which a case is a regression, exits with 1 if any")
+    return parser.parse_args(arguments)
+
+def main(arguments=None):
+    """Runs the benchmark described by the command line arguments, and prints a report.
+
+    Arguments:
+        arguments (list of strings) - optional: Command line arguments. (Default: sys.argv)
+    """
+    options = parseArguments(arguments)
+
+    startTime = time.perf_counter()
+    if options.dictionary is not None:
+        wordDictionary = dictionary.Dictionary(options.dictionary, validLetters=batch.letterSets[options.letterset])
+    else:
+        words = syntheticWords(options.words, batch.letterSets[options.letterset], options.lengths, options.dictionary_seed, options.skew)
+        wordDictionary = dictionary.Dictionary.fromWords(words)
+    if options.frequency_cache > 0:
+        wordDictionary.enableFrequencyCache(maxBytes=int(options.frequency_cache * 2**20))
+    print("Dictionary of %d words prepared in %.2fs" % (len(wordDictionary.words), time.perf_counter() - startTime))
+
+    solverOptions = {"trail": not options.copy, "engine": options.engine, "learning": options.learn, "restarts": options.restarts}
+    results = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "options": {key: value for key, value in vars(options).items() if key not in ("output", "baseline")},
+        "cases": [],
+    }
+
+    print("%-14s %7s %10s %11s %11s %10s" % ("case", "solved", "time", "iterations", "backtracks", "memory"))
+    for size in options.sizes:
+        for layout in options.layouts:
+            case = runCase(wordDictionary, size, layout, options.seeds, options.time_limit, options.storage, not options.no_memory, options.symmetric, **solverOptions)
+            results["cases"].append(case)
+            summary = case["summary"]
+            memory = "%.1fMB" % (summary["maxPeakMemory"] / 1e6) if "maxPeakMemory" in summary else "-"
+            print("%-14s %4d/%-2d %9.3fs %11g %11g %10s" % (caseName(case), summary["solved"], len(case["runs"]),
+                  summary["medianTime"], summary["medianIterations"], summary["medianBacktracks"], memory))
+
+    if options.output is not None:
+        with open(options.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if options.baseline is not None:
+        with open(options.baseline) as f:
+            baseline = json.load(f)
+        comparison, regressions = compare(results, baseline, options.threshold)
+        print()
+        print("%-14s %10s %10s %7s" % ("case", "baseline", "time", "ratio"))
+        for name, before, after, ratio in comparison:
+            print("%-14s %9.3fs %9.3fs %6.2fx%s" % (name, before, after, ratio, "  slower" if name in regressions else ""))
+        if regressions:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
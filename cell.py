@@ -1,5 +1,6 @@
 from random import random
 from math import log
+from array import array
 from typing import NamedTuple
 
 class Coords(NamedTuple):
@@ -20,6 +21,7 @@ class Cell(object):
         _options (dict): Letter options for cell, valued based on their likelihood to appear.
         _blacklist (list): Letters that result in an unsolvable state for each cell of the grid.
         _mask (bool): Indicates if cell should be excluded from the word validity checks, e.g. fixed cells.
+        layoutListener (callable): Called when the cell is blocked or unblocked, None if nobody is listening.
     """
     def __init__(self, coords, letterset) -> None:
         """Initializes a new cell instance.
@@ -30,6 +32,8 @@ class Cell(object):
         """
         self.coords = coords
         self.options = {letter: 0 for letter in letterset}
+        self._blocked = False
+        self.layoutListener = None
         self.reset()
     
     def reset(self) -> None:
@@ -79,6 +83,8 @@ class Cell(object):
         """
         if blocked:
             self.options = {letter:0 for letter in self.options}
+        if blocked != self._blocked and self.layoutListener is not None:
+            self.layoutListener()
         self._blocked = blocked
     
     def setLetter(self, letter:str) -> None:
@@ -89,6 +95,22 @@ class Cell(object):
         """
         self.options = {option:int(letter==option) for option in self.options}
 
+    def getState(self):
+        """Returns the current options and blacklist, so they can be restored later.
+
+        Returns:
+            state (tuple): Copy of the options and the blacklist.
+        """
+        return (dict(self.options), list(self.blacklist))
+
+    def setState(self, state) -> None:
+        """Restores options and blacklist saved by getState.
+
+        Arguments:
+            state (tuple): Options and blacklist to restore.
+        """
+        self.options, self.blacklist = state
+
     def setLetterCount(self, letter: str, count: int) -> None:
         """Sets the count of a single letter. If count is 0, deletes the letter from valid options.
         
@@ -99,6 +121,25 @@ class Cell(object):
         if not self.mask:
             self.options[letter] = count
     
+    def getLetterCount(self, letter: str) -> int:
+        """Gets the count of a single letter.
+
+        Arguments:
+            letter (char): Letter to get.
+
+        Returns:
+            (int): Count of given letter, 0 if letter is invalid for this position.
+        """
+        return self.options[letter]
+
+    def allowedLetters(self) -> str:
+        """Collects every valid letter.
+
+        Returns:
+            (str): Valid letters concatenated.
+        """
+        return ''.join(letter for letter in self.options if self.options[letter] > 0)
+
     def sumOptions(self) -> int:
         """Sums the weights for all valid letters.
 
@@ -154,5 +195,202 @@ class Cell(object):
             if rnd < 0:
                 self.setLetter(letter)
                 return letter
-    
-    
\ No newline at end of file
+
+
+class LetterTable(object):
+    """Mapping between letters and their indexes, shared by every compact cell using the same letterset.
+
+    Attributes:
+        letters (str): All valid letters concatenated, in index order.
+        index (dict): Index of each letter.
+    """
+    __slots__ = ('letters', 'index')
+    _tables = {}
+
+    def __init__(self, letters) -> None:
+        self.letters = letters
+        self.index = {letter: i for i, letter in enumerate(letters)}
+
+    @classmethod
+    def get(cls, letterset) -> 'LetterTable':
+        """Returns the shared table for a letterset, creating it on first use.
+
+        Arguments:
+            letterset (string): All valid letters concatenated.
+        """
+        letters = ''.join(letterset)
+        if letters not in cls._tables:
+            cls._tables[letters] = cls(letters)
+        return cls._tables[letters]
+
+    def __deepcopy__(self, memo) -> 'LetterTable':
+        # Tables are never changed, copies of a cell can share them
+        return self
+
+class CompactCell(object):
+    """Cell storing its options as a weight array and a bitmask of valid letters. Has the same interface as Cell.
+
+    Attributes:
+        coords (tuple): Coorinates of the cell.
+        table (LetterTable): Shared mapping between letters and weight indexes.
+        weights (array): Weight of each letter, in the order of the letter table.
+        viable (int): Bitmask of valid letters, bit i is set if weights[i] > 0.
+        total (int): Sum of the weights.
+        blacklist (list): Letters that result in an unsolvable state.
+    """
+    __slots__ = ('coords', 'table', 'weights', 'viable', 'total', 'blacklist', 'layoutListener', '_mask', '_blocked')
+
+    def __init__(self, coords, letterset, weights=None) -> None:
+        """Initializes a new cell instance.
+
+        Arguments:
+            coords (tuple): Coorinates of the cell.
+            letterset (string): All valid letters concatenated.
+            weights (array) - optional: Buffer to store the weights in. (Default: A new array is allocated)
+        """
+        self.coords = coords
+        self.table = LetterTable.get(letterset)
+        self.weights = array('I', bytes(4 * len(self.table.letters))) if weights is None else weights
+        self._blocked = False
+        self.layoutListener = None
+        self.reset()
+
+    def reset(self) -> None:
+        """Disable mask, empty blacklist, unblock cell, set every letter option.
+        """
+        self.mask = False
+        self.blocked = False
+        self.blacklist = []
+        for i in range(len(self.weights)):
+            self.weights[i] = 9999
+        self.viable = (1 << len(self.weights)) - 1
+        self.total = 9999 * len(self.weights)
+
+    @property
+    def options(self) -> dict:
+        """Letter options as a dict, the same way as Cell stores them. Changes to the dict are not applied to the cell.
+
+        Returns:
+            (dict): Weight of each letter.
+        """
+        return {letter: int(self.weights[i]) for i, letter in enumerate(self.table.letters)}
+
+    @property
+    def mask(self) -> bool:
+        return self._mask
+
+    @mask.setter
+    def mask(self, mask:bool = True) -> None:
+        self._mask = mask
+
+    @property
+    def blocked(self) -> bool:
+        return self._blocked
+
+    @blocked.setter
+    def blocked(self, blocked:bool) -> None:
+        if blocked:
+            for i in range(len(self.weights)):
+                self.weights[i] = 0
+            self.viable = 0
+            self.total = 0
+        if blocked != self._blocked and self.layoutListener is not None:
+            self.layoutListener()
+        self._blocked = blocked
+
+    def setLetter(self, letter:str) -> None:
+        for i in range(len(self.weights)):
+            self.weights[i] = 0
+        i = self.table.index[letter]
+        self.weights[i] = 1
+        self.viable = 1 << i
+        self.total = 1
+
+    def setLetterCount(self, letter: str, count: int) -> None:
+        if not self.mask:
+            i = self.table.index[letter]
+            self.total += count - int(self.weights[i])
+            self.weights[i] = count
+            if count:
+                self.viable |= 1 << i
+            else:
+                self.viable &= ~(1 << i)
+
+    def getLetterCount(self, letter: str) -> int:
+        return int(self.weights[self.table.index[letter]])
+
+    def allowedLetters(self) -> str:
+        letters = self.table.letters
+        return ''.join(letters[i] for i in self.viableIndexes())
+
+    def viableIndexes(self):
+        """Yields the index of every valid letter.
+        """
+        viable = self.viable
+        while viable:
+            lowest = viable & -viable
+            viable ^= lowest
+            yield lowest.bit_length() - 1
+
+    def getState(self):
+        return (array('I', self.weights), self.viable, self.total, list(self.blacklist))
+
+    def setState(self, state) -> None:
+        weights, self.viable, self.total, self.blacklist = state
+        self.weights[:] = weights
+
+    def sumOptions(self) -> int:
+        return self.total
+
+    def shannonEntropy(self) -> float:
+        entropy = 0
+        for i in self.viableIndexes():
+            letterProbability = self.weights[i] / self.total
+            entropy -= letterProbability * log(letterProbability)
+        return entropy
+
+    def isDefined(self) -> bool:
+        return (self.viable != 0 and self.viable & (self.viable - 1) == 0) or self._blocked
+
+    def getDefined(self) -> str:
+        if self.viable:
+            return self.table.letters[(self.viable & -self.viable).bit_length() - 1]
+
+    def define(self) -> str:
+        rnd = random() * self.total
+
+        for i in self.viableIndexes():
+            rnd -= self.weights[i]
+            if rnd < 0:
+                letter = self.table.letters[i]
+                self.setLetter(letter)
+                return letter
+
+class TensorCell(CompactCell):
+    """Compact cell whose weights and blocked flag are views into the arrays of the grid, so the whole grid can be processed at once.
+
+    Attributes:
+        blockedFlag (array): Single element view of the blocked flags of the grid.
+    """
+    __slots__ = ('blockedFlag',)
+
+    def __init__(self, coords, letterset, weights, blockedFlag) -> None:
+        """Initializes a new cell instance.
+
+        Arguments:
+            coords (tuple): Coorinates of the cell.
+            letterset (string): All valid letters concatenated.
+            weights (array): View of the weights of the cell in the grid.
+            blockedFlag (array): Single element view of the blocked flag of the cell in the grid.
+        """
+        self.blockedFlag = blockedFlag
+        super(TensorCell, self).__init__(coords, letterset, weights)
+
+    @property
+    def blocked(self) -> bool:
+        return self._blocked
+
+    @blocked.setter
+    def blocked(self, blocked:bool) -> None:
+        CompactCell.blocked.fset(self, blocked)
+        self.blockedFlag[0] = blocked
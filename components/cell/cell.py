@@ -19,38 +19,67 @@ class Cell(ToggleButtonBehavior, FloatLayout):
         self.blocked = False
         self.options = ''
         self.entropy = 1.0
+        # Last shown state, None until the first update
+        self.shownState = None
 
-        self.rectangle = Rectangle(size=[self.size[0]-2, self.size[1]-2], pos=self.pos)
+        # Instructions are created once and changed in place, so the canvas does not grow with every update
+        with self.canvas.before:
+            self.backgroundColor = Color(1, 1, 1, 1)
+            self.backgroundRectangle = Rectangle(size=[self.size[0]-2, self.size[1]-2], pos=self.pos)
+            # Inner fill of the active cell, transparent unless the cell is active
+            self.innerColor = Color(1, 1, 1, 0)
+            self.innerRectangle = Rectangle(size=[self.size[0]-10, self.size[1]-10], pos=[self.pos[0]+4, self.pos[1]+4])
 
         # listen to size and position changes
         self.bind(pos=self.updateRectangle, size=self.updateRectangle)
 
-    def drawRectangle(self, color):
-        with self.canvas.before:
-            Color(*color)
-            self.rectangle = Rectangle(size=[self.size[0]-2, self.size[1]-2], pos=self.pos)
-    
     def updateRectangle(self, *args):
-        self.rectangle.size = [self.size[0]-2, self.size[1]-2]
-        self.rectangle.pos = self.pos
+        self.backgroundRectangle.size = [self.size[0]-2, self.size[1]-2]
+        self.backgroundRectangle.pos = self.pos
+        self.innerRectangle.size = [self.size[0]-10, self.size[1]-10]
+        self.innerRectangle.pos = [self.pos[0]+4, self.pos[1]+4]
     
-    def drawBackground(self, *args):
+    def backgroundRGBA(self):
+        """Returns the background color of the cell, based on its state.
+
+        Returns:
+            (tuple): Red, green, blue and alpha components.
+        """
         if self.defined:
             if self.masked:
                 if self.blocked:
-                    self.drawRectangle((0,0,0,1))
-                else:
-                    self.drawRectangle((1, 1, 0.5, 1))
-            else:
-                self.drawRectangle((1, 1, 1, 1))
+                    return (0, 0, 0, 1)
+                return (1, 1, 0.5, 1)
+            return (1, 1, 1, 1)
+        if self.entropy > 0:
+            saturation = 1.0 - 0.5*max(0.0, min(1.0 / self.entropy, 1.0))
+            return (1, saturation, saturation, 1)
+        return (1, 0, 0, 1)
+
+    def drawBackground(self, *args):
+        if self.state == "down":
+            # Red frame white fill to indicate active cell
+            self.backgroundColor.rgba = (1, 0, 0, 1)
+            self.innerColor.a = 1
         else:
-            if self.entropy > 0:
-                saturation = 1.0 - 0.5*max(0.0, min(1.0 / self.entropy, 1.0))
-                self.drawRectangle((1, saturation, saturation, 1))
-            else:
-                self.drawRectangle((1, 0, 0, 1))
+            self.backgroundColor.rgba = self.backgroundRGBA()
+            self.innerColor.a = 0
 
     def update(self, defined, masked, blocked, options, entropy):
+        """Shows the state of a cell, as published in a snapshot.
+
+        Arguments:
+            defined (bool): True if the cell has a single letter or is blocked.
+            masked (bool): True if the cell was fixed by hand.
+            blocked (bool): True if the cell is blocked.
+            options (str): Allowed letters, most common first.
+            entropy (float): Entropy of the cell.
+        """
+        # Unchanged cells are not drawn again
+        state = (defined, masked, blocked, options, entropy)
+        if state == self.shownState:
+            return
+        self.shownState = state
         self.defined = defined
         self.masked = masked
         self.blocked = blocked
@@ -58,24 +87,13 @@ class Cell(ToggleButtonBehavior, FloatLayout):
         self.entropy = entropy
 
         if defined:
-            for letter in self.options:
-                if self.options[letter] > 0:
-                    defined_letter = letter
-            self.main_letter.text = defined_letter.upper()
+            self.main_letter.text = options[:1].upper()
             self.letter_options.text = ''
         else:
             self.main_letter.text = ''
-            self.letter_options.text = ''.join(letter for letter, count in sorted(self.options.items(), key=lambda item: item[1], reverse=True) if count > 0)
+            self.letter_options.text = options
         
         self.drawBackground()
 
     def change_state(self):
-        if self.state == "down":
-            # Red frame white fill to indicate active cell
-            with self.canvas.before:
-                Color(1, 0, 0, 1)
-                Rectangle(size=[self.size[0]-2, self.size[1]-2], pos=self.pos)
-                Color(1, 1, 1, 1)
-                Rectangle(size=[self.size[0]-10, self.size[1]-10], pos=[self.pos[0]+4, self.pos[1]+4])
-        else:
-            self.drawBackground()
\ No newline at end of file
+        self.drawBackground()
@@ -1,10 +1,12 @@
-import re
 import math
 import random
 import time
+from collections import deque
 import dictionary
 import cell
 import grid
+from metrics import Metrics
+from nogoods import NogoodStore
 
 class Crossword(object):
     """Class for keeping track of and interacting with a rectangular crossword grid.
@@ -16,25 +18,325 @@ class Crossword(object):
         options (2D list of dicts): Valid letters for each cell of the grid.
         blacklist (2D list of lists): Letters that result in an unsolvable state for each cell of the grid.
         mask (2D list of bool): Indicates if certain cells should be excluded from the word validity checks.
+        candidates (dict): Still viable dictionary words for each word slot, as a bitset and the letters it was narrowed with.
+        wordBlacklist (dict): Words that result in an unsolvable state for each word slot, as a bitset of the dictionary lookup of its length.
+        trail (list): Undo entries for every change since the trail was enabled, None if changes are not recorded.
+        pendingSlots (set): Word slots evaluated since the last incremental validity check.
+        validSlots (dict): Word of every complete slot that passed an incremental validity check.
+        validWords (set): Words of validSlots, to check uniqueness.
+        reasons (dict): Decision levels that removed letters of each cell as a bitmask, None if conflicts are not analysed.
+        nogoods (NogoodStore): Learned combinations of letters that can't be part of a solution, None if conflicts are not analysed.
+        conflict (int): Decision levels causing the last failed validity check as a bitmask.
+        metrics (Metrics): Counters and timers of the updates, shared by the copies of the crossword.
     """
 
-    def __init__(self, size, dictionary):
+    def __init__(self, size, dictionary, storage="dict", symmetric=False):
         """Initializes a new crossword instance.
 
         Arguments:
             size (tuple): Width and height of the grid
             dictionary (dict): Valid words that can be used to fill the grid.
+            storage (str) - optional: Storage of the cell options, "dict", "compact" or "numpy", see Grid. (Default: "dict")
+            symmetric (bool) - optional: If True, every row reads the same as the column with the same index, see Grid. Each of these word pairs is a single slot, evaluated and validated once. (Default: False)
         """
         self.dictionary = dictionary
 
         # Initially every letter is an option for every field
-        self.grid = grid.Grid(size, self.dictionary.validLetters)
+        self.grid = grid.Grid(size, self.dictionary.letters, storage, symmetric)
+
+        # Viable words of each word slot, keyed by the coordinates of its letters
+        self.candidates = {}
+        self.wordBlacklist = {}
+
+        self.metrics = Metrics()
+
+        # Bookkeeping of the incremental validity check
+        self.resetValidity()
+
+        # Changes are only recorded if the crossword is solved in place
+        self.trail = None
+
+        # Causes of the changes are only recorded if conflicts are analysed
+        self.reasons = None
+        self.nogoods = None
+        self.conflict = 0
 
         # TODO - Perform an initial update based on constraints from dictionary
         #self.updateOptions()
     
     def reset(self):
         self.grid.reset()
+        self.candidates = {}
+        self.wordBlacklist = {}
+        self.resetValidity()
+        if self.trail is not None:
+            self.enableTrail()
+        if self.reasons is not None:
+            self.reasons = {}
+
+    def setLayout(self, blocked=(), letters=None):
+        """Blocks cells and fixes letters, the same way as editing the grid by hand. Changed cells are masked, so they are kept on reset.
+
+        Arguments:
+            blocked (iterable of tuples) - optional: Coordinates of the cells to block.
+            letters (dict) - optional: Letter to set for the coordinates of each cell.
+        """
+        for coords in blocked:
+            self.grid[coords].blocked = True
+            self.grid[coords].mask = True
+        for coords, letter in (letters or {}).items():
+            self.grid[coords].blocked = False
+            self.grid[coords].setLetter(letter)
+            self.grid[coords].mask = True
+
+    def enableTrail(self):
+        """Starts recording changes, so they can be undone without keeping copies of the crossword.
+        """
+        self.trail = []
+        # Cells and slots already saved on each decision level, saving the first state is enough to undo a level
+        self.trailLevels = [set()]
+
+    def enableLearning(self, nogoods=None):
+        """Starts recording which decisions removed the letters of each cell, so the decisions causing a deadend can be found, and learns nogoods from them.
+
+        Arguments:
+            nogoods (NogoodStore) - optional: Store of the learned nogoods. (Default: New empty store)
+        """
+        self.reasons = {}
+        self.nogoods = nogoods if nogoods is not None else NogoodStore()
+
+    def disableLearning(self):
+        """Stops recording the causes of the changes, and forgets the learned nogoods.
+        """
+        self.reasons = None
+        self.nogoods = None
+
+    def addReason(self, coords, reason):
+        """Records decision levels as causes of the changes of a cell. Has to be called after saveCell.
+
+        Arguments:
+            coords (tuple): Coordinates of the cell.
+            reason (int): Decision levels as a bitmask.
+        """
+        if self.reasons is not None and reason:
+            self.reasons[coords] = self.reasons.get(coords, 0) | reason
+
+    def slotReason(self, slot):
+        """Collects the causes of the changes of every cell of a word slot.
+
+        Arguments:
+            slot (tuple of tuples): Coordinates of the letters of the word.
+
+        Returns:
+            reason (int): Decision levels as a bitmask.
+        """
+        reason = 0
+        for coords in slot:
+            reason |= self.reasons.get(coords, 0)
+        return reason
+
+    def findConflict(self):
+        """Finds the decision levels responsible for a deadend or a failed validity check. Requires enableLearning.
+
+        Returns:
+            conflict (int): Decision levels as a bitmask.
+        """
+        for gridCell in self.grid:
+            if self.isEmpty(gridCell.coords):
+                return self.reasons.get(gridCell.coords, 0)
+        return self.conflict
+
+    def applyNogoods(self, coords):
+        """Removes letters that would complete a learned nogood, given the letter of a defined cell.
+
+        Arguments:
+            coords (tuple): Coordinates of the cell.
+
+        Returns:
+            changedCoords (list of tuples): Coordinates of the cells that lost a letter option.
+        """
+        gridCell = self.grid[coords]
+        if self.nogoods is None or gridCell.blocked or not gridCell.isDefined():
+            return []
+
+        changedCoords = []
+        letter = gridCell.getDefined()
+        for nogood in self.nogoods.involving(coords, letter):
+            remaining = [(otherCoords, otherLetter) for otherCoords, otherLetter in nogood
+                         if not (self.grid[otherCoords].isDefined() and self.grid[otherCoords].getDefined() == otherLetter)]
+            if len(remaining) > 1:
+                continue
+            # If every assignment holds, the cell itself loses its letter
+            targetCoords, targetLetter = remaining[0] if remaining else (coords, letter)
+            if self.grid[targetCoords].getLetterCount(targetLetter) == 0:
+                continue
+
+            self.saveCell(targetCoords)
+            self.grid[targetCoords].setLetterCount(targetLetter, 0)
+            self.addReason(targetCoords, self.slotReason([otherCoords for otherCoords, _ in nogood]))
+            self.nogoods.pruned += 1
+            self.metrics.count("nogood_prunes")
+            changedCoords.append(targetCoords)
+        return changedCoords
+
+    def pushLevel(self):
+        """Starts a new decision level on the trail.
+
+        Returns:
+            mark (int): Trail position to undo to, when reverting the level.
+        """
+        self.trailLevels.append(set())
+        return len(self.trail)
+
+    def undoLevel(self, mark):
+        """Reverts every change of the current decision level.
+
+        Arguments:
+            mark (int): Trail position returned by pushLevel.
+        """
+        while len(self.trail) > mark:
+            function, args = self.trail.pop()
+            function(*args)
+        self.trailLevels.pop()
+
+    def saveCell(self, coords):
+        """Has to be called before a cell is changed. Records the state of the cell on the trail if the trail is enabled, and marks its entropy as outdated.
+
+        Arguments:
+            coords (tuple): Coordinates of the cell.
+        """
+        self.grid.entropyChanged(coords)
+        if self.trail is None or coords in self.trailLevels[-1]:
+            return
+        self.trailLevels[-1].add(coords)
+        reason = self.reasons.get(coords, 0) if self.reasons is not None else 0
+        self.trail.append((self.restoreCell, (coords, self.grid[coords].getState(), reason)))
+
+    def restoreCell(self, coords, state, reason=0):
+        """Restores the state of a cell from the trail.
+
+        Arguments:
+            coords (tuple): Coordinates of the cell.
+            state (tuple): State returned by the getState method of the cell.
+            reason (int) - optional: Causes of the changes of the cell, see addReason. (Default: No causes)
+        """
+        self.grid[coords].setState(state)
+        self.grid.entropyChanged(coords)
+        if self.reasons is not None:
+            self.reasons[coords] = reason
+
+    def restoreCandidates(self, slot, candidates):
+        """Restores the viable words of a slot from the trail.
+
+        Arguments:
+            slot (tuple of tuples): Coordinates of the letters of the word.
+            candidates (tuple): Previous bitset and letters, None if the slot was not evaluated before.
+        """
+        if candidates is None:
+            del self.candidates[slot]
+        else:
+            self.candidates[slot] = candidates
+
+    def blacklistWord(self, slot, word):
+        """Excludes a word from a slot, the options of its cells are updated by the next updateOptions of the slot.
+
+        Arguments:
+            slot (tuple of tuples): Coordinates of the letters of the word.
+            word (string): Word to exclude.
+        """
+        blacklist = self.wordBlacklist.get(slot, 0)
+        if self.trail is not None:
+            self.trail.append((self.restoreWordBlacklist, (slot, blacklist)))
+        # The positional index matches the bit of the word itself
+        self.wordBlacklist[slot] = blacklist | self.dictionary.matchingWords(word)
+
+    def restoreWordBlacklist(self, slot, blacklist):
+        """Restores the excluded words of a slot from the trail.
+
+        Arguments:
+            slot (tuple of tuples): Coordinates of the letters of the word.
+            blacklist (int): Previous bitset of the excluded words.
+        """
+        if blacklist:
+            self.wordBlacklist[slot] = blacklist
+        else:
+            self.wordBlacklist.pop(slot, None)
+
+    def findMostConstrainedSlot(self, noise=None):
+        """Finds the word slot with the fewest viable words, among the slots with an undefined cell.
+
+        Arguments:
+            noise (float) - optional: Level of noise mixed into the number of words, to break ties randomly. (Default: Ties are broken in slot order)
+
+        Returns:
+            slot (tuple of tuples): Coordinates of the letters of the word, None if every slot is defined.
+            candidates (int): Bitset of the viable words of the slot.
+        """
+        bestSlot, bestCandidates, bestScore = None, 0, None
+        for slot in self.grid.findWordSlots():
+            if all(self.grid[coords].isDefined() for coords in slot):
+                continue
+            allowedLetters = [self.grid[coords].allowedLetters() for coords in slot]
+            candidates = self.narrowCandidates(slot, allowedLetters) & ~self.wordBlacklist.get(slot, 0)
+            score = candidates.bit_count()
+            if noise:
+                score -= noise * random.random() / 1000
+            if bestScore is None or score < bestScore:
+                bestSlot, bestCandidates, bestScore = slot, candidates, score
+        return bestSlot, bestCandidates
+
+    def chooseWord(self, slot, candidates, sampleSize=256):
+        """Chooses a word for a slot randomly, weighted by how common its letters are in the crossing words.
+        Only a sample of the candidates is weighted, starting from a random word. Words already in the grid are only chosen if every sampled word is.
+
+        Arguments:
+            slot (tuple of tuples): Coordinates of the letters of the word.
+            candidates (int): Bitset of the viable words of the slot.
+            sampleSize (int) - optional: Maximum number of candidates to weight. (Default: 256)
+
+        Returns:
+            word (string): Chosen word, None if there are no candidates.
+        """
+        length = len(slot)
+        words = self.dictionary.lookup[length]
+        sample = []
+        for i in self.dictionary.candidateIndexes(length, candidates, sampleSize, random.randrange(len(words))):
+            word = words[i]
+            weight = 0
+            if word not in self.validWords:
+                weight = 1
+                for coords, letter in zip(slot, word):
+                    if not self.grid[coords].isDefined():
+                        weight *= self.grid[coords].getLetterCount(letter)
+            sample.append((word, weight))
+        if not sample:
+            return None
+
+        rnd = random.random() * sum(weight for word, weight in sample)
+        for word, weight in sample:
+            rnd -= weight
+            if rnd < 0:
+                return word
+        return sample[0][0]
+
+    def placeWord(self, slot, word):
+        """Sets the letters of a word in the undefined cells of a slot.
+
+        Arguments:
+            slot (tuple of tuples): Coordinates of the letters of the word.
+            word (string): Word to set.
+
+        Returns:
+            changedCoords (list of tuples): Coordinates of the cells that were set.
+        """
+        changedCoords = []
+        for coords, letter in zip(slot, word):
+            if self.grid[coords].isDefined():
+                continue
+            self.saveCell(coords)
+            self.grid[coords].setLetter(letter)
+            changedCoords.append(coords)
+        return changedCoords
 
     #@profile
     def find_frequencies(self, options):
@@ -46,133 +348,276 @@ class Crossword(object):
         Returns:
             frequencies (list of dicts): Letter frequencies for each position.
         """
-        
-        #TODO: Running this function takes ~95% of the runtime. Performance could be greatly increased by making this lookup more efficient.
-        frequencies = [{} for option in options]
-
-        # Convert elements to regular expression:
-        regex = "^"
-        for element in options:
-            regex += "[" + ''.join([letter for letter in element if element[letter]>0]) + "]"
-        regex += "$"
-        r = re.compile(regex, re.UNICODE)
+        # Words are matched through the positional index of the dictionary, instead of scanning every word
+        allowedLetters = [''.join(letter for letter in element if element[letter] > 0) for element in options]
 
         # Find letter options/counts based on matching words
-        for word in list(filter(r.match, self.dictionary.lookup[len(options)])):
-            for position, letter in enumerate(word):
-                if letter not in frequencies[position]:
-                    frequencies[position][letter] = 0
-                frequencies[position][letter] += 1
+        return self.letterFrequencies(allowedLetters)
+    
+    def letterFrequencies(self, allowedLetters, candidates=None, excluded=0):
+        """Counts the letters of the matching words for each position, or looks them up in the frequency cache of the dictionary if it is enabled.
+
+        Arguments:
+            allowedLetters (list of strings): Allowed letters for each position, in the order of the letters of the dictionary.
+            candidates (int) - optional: Bitset of the matching words, if already known. (Default: Matched from the dictionary)
+            excluded (int) - optional: Bitset of the words not to count, these are never cached. (Default: Every matching word is counted)
+
+        Returns:
+            frequencies (list of dicts): Letter frequencies for each position. Can be shared with the cache, must not be changed.
+        """
+        # Frequencies without some of the words only hold for a single slot
+        cache = self.dictionary.frequencyCache if not excluded else None
+        if cache is not None:
+            key = (len(allowedLetters), tuple(allowedLetters))
+            frequencies = cache.get(key)
+            if frequencies is not None:
+                self.metrics.count("frequency_cache_hits")
+                return frequencies
+            self.metrics.count("frequency_cache_misses")
+
+        if candidates is None:
+            candidates = self.dictionary.matchingWords(allowedLetters)
+            self.metrics.count("dictionary_lookups")
+        candidates &= ~excluded
+        frequencies = self.dictionary.letterCounts(candidates, allowedLetters)
+        self.metrics.count("dictionary_lookups")
+        self.metrics.count("words_scanned", candidates.bit_count())
 
+        if cache is not None:
+            cache.put(key, frequencies)
         return frequencies
-    
+
     def updateWordOptions(self, letterCoords):
         """Updates the valid letter options for given cells, by performing a lookup using the current letter options, and removing those that don't appear in the results.
         
         Arguments:
             letterCoords (list of tuples): List of coordinates to set.
+
+        Returns:
+            changedCoords (list of tuples): Coordinates of the cells that lost a letter option.
         """
-        wordOptions = []
-        for coords in letterCoords:
-            wordOptions.append(self.grid[coords].options)
-        
-        #TODO: Running the find frequencies function takes ~95% of the runtime. Performance could be greatly increased by performing less lookups.
-        for position, frequencies in enumerate(self.find_frequencies(wordOptions)):
+        slot = tuple(letterCoords)
+        allowedLetters = [self.grid[coords].allowedLetters() for coords in slot]
+        self.pendingSlots.add(slot)
+
+        # Only the remaining words of the slot are counted, instead of matching the whole dictionary again
+        candidates = self.narrowCandidates(slot, allowedLetters)
+
+        changedCoords = []
+        # Letters removed here are caused by the decisions that changed any cell of the slot
+        reason = self.slotReason(slot) if self.reasons is not None else 0
+        for position, frequencies in enumerate(self.letterFrequencies(allowedLetters, candidates, self.wordBlacklist.get(slot, 0))):
             coords = letterCoords[position]
-            for letter in self.grid[coords].options.copy():
+            if self.grid[coords].mask:
+                continue
+            # Letters that are already invalid can be skipped
+            for letter in allowedLetters[position]:
                 if letter not in frequencies or letter in self.grid[coords].blacklist:
                     # Invalidate letters that are blacklisted or don't appear in words.
+                    self.saveCell(coords)
                     self.grid[coords].setLetterCount(letter, 0)
-                else:
+                    self.addReason(coords, reason)
+                    if not changedCoords or changedCoords[-1] != coords:
+                        changedCoords.append(coords)
+                elif frequencies[letter] < self.grid[coords].getLetterCount(letter):
                     # Take the minimum of the existing and new letter weights.
                     # This is done so that if a letter is very common for horizontal words but rare for vertical words, it will be considered rare.
-                    self.grid[coords].setLetterCount(letter, min(self.grid[coords].options[letter], frequencies[letter]))
+                    self.saveCell(coords)
+                    self.grid[coords].setLetterCount(letter, frequencies[letter])
+
+        return changedCoords
+
+    def narrowCandidates(self, slot, allowedLetters):
+        """Narrows the viable words of a slot, by removing words with letters that are no longer allowed since the last update.
+
+        Arguments:
+            slot (tuple of tuples): Coordinates of the letters of the word.
+            allowedLetters (list of strings): Allowed letters for each position.
+
+        Returns:
+            candidates (int): Bitset of viable words in the dictionary lookup for the length of the slot.
+        """
+        length = len(slot)
+        if slot not in self.candidates:
+            candidates = self.dictionary.matchingWords(allowedLetters)
+            self.metrics.count("dictionary_lookups")
+        else:
+            candidates, previousLetters = self.candidates[slot]
+            for position, letters in enumerate(allowedLetters):
+                if letters == previousLetters[position]:
+                    continue
+                removed = set(previousLetters[position]).difference(letters)
+                if len(removed) + len(letters) != len(previousLetters[position]):
+                    # Options grew since the last update (e.g. cell was reset), start over
+                    candidates = self.dictionary.matchingWords(allowedLetters)
+                    self.metrics.count("dictionary_lookups")
+                    break
+                # Use whichever mask is cheaper to build
+                if len(removed) < len(letters):
+                    candidates &= ~self.dictionary.positionMask(length, position, removed)
+                else:
+                    candidates &= self.dictionary.positionMask(length, position, letters)
+
+        if self.trail is not None and slot not in self.trailLevels[-1]:
+            self.trailLevels[-1].add(slot)
+            self.trail.append((self.restoreCandidates, (slot, self.candidates.get(slot))))
+        self.candidates[slot] = (candidates, tuple(allowedLetters))
+        return candidates
 
     #@profile
-    def updateOptions(self):
-        """Iteratively updates letter options, until a minimum subset is reached. After this update, the crossword is either solvable and all invalid letters are eliminated or a deadend is confirmed.
+    def updateOptions(self, changedCoords=None):
+        """Updates letter options until every word slot is consistent. After this update, the crossword is either solvable and all invalid letters are eliminated or a deadend is confirmed.
+        Only slots crossing a cell whose letters changed are re-evaluated, starting from the slots of the given cells.
+
+        Arguments:
+            changedCoords (list of tuples) - optional: Coordinates of the cells changed since the last update. (Default: Every cell of the grid)
+
+        Returns:
+            nUpdates (int): Number of word slots evaluated.
         """
-        old_total_options = self.grid.totalOptions()
-        
         startTime = time.perf_counter()
         nUpdates = 0
-        # Do this while the total number of valid letters are decreasing, hence the crossword is more defined
-        while(True):
+
+        if changedCoords is None:
+            changedCoords = [cell.coords for cell in self.grid]
+            queue = deque(self.grid.findWordSlots())
+            # Cells could have been changed from outside
+            self.grid.resetEntropyTracker()
+            self.resetValidity()
+        else:
+            queue = deque(dict.fromkeys(slot for coords in changedCoords for slot in self.grid.findWordSlots(coords)))
+        queued = set(queue)
+
+        # Remove blacklisted letters:
+        for coords in changedCoords:
+            if self.grid[coords].blacklist:
+                self.saveCell(coords)
+            for letter in self.grid[coords].blacklist:
+                self.grid[coords].setLetterCount(letter, 0)
+
+        # Learned nogoods can remove letters of other cells, whose slots have to be checked too
+        if self.nogoods is not None:
+            for coords in list(changedCoords):
+                for nogoodCoords in self.applyNogoods(coords):
+                    changedCoords.append(nogoodCoords)
+                    for crossingSlot in self.grid.findWordSlots(nogoodCoords):
+                        if crossingSlot not in queued:
+                            queue.append(crossingSlot)
+                            queued.add(crossingSlot)
+
+        # Stop updating if already deadend
+        if any(self.isEmpty(coords) for coords in changedCoords):
+            queue.clear()
+
+        # Re-evaluate slots, until none of them can remove any more letters
+        while queue:
+            slot = queue.popleft()
+            queued.discard(slot)
             nUpdates += 1
-            # Remove blacklisted letters:
-            for cell in self.grid:
-                for letter in cell.blacklist:
-                    cell.setLetterCount(letter, 0)
-            
-            # Stop updating if already deadend
-            if self.grid.isDeadend():
-                break
-            
-            # Keep track of what has been updated, to avoid updating a word for every letter
-            horizontalUpdated = [[False for w in range(self.grid.width)] for h in range(self.grid.height)]
-            verticalUpdated = [[False for w in range(self.grid.width)] for h in range(self.grid.height)]
-
-            # Go through every cell
-            for y in range(self.grid.height):
-                for x in range(self.grid.width):
-                    coords = (x, y)
-
-                    # Skip cell if it's defined or masked
-                    if self.grid[coords].isDefined() or self.grid[coords].mask:
-                        continue
-                    
-                    # Stop updating if already deadend
-                    if self.grid.isDeadend():
-                        break
-                    
-                    # If horizontal word of the cell was not yet updated, update it
-                    if horizontalUpdated[y][x] != True:
-                        wordCoords = self.grid.findHorizontalWordLetters(coords)
-                        if(len(wordCoords)>2):
-                            self.updateWordOptions(wordCoords)
-                        # Note that the word was updated
-                        for x1, y1 in wordCoords:
-                            horizontalUpdated[y1][x1] = True
-                    
-                    # Stop updating if already deadend
-                    if self.grid.isDeadend():
-                        break
-
-                    # If vertical word of the cell was not yet updated, update it
-                    if verticalUpdated[y][x] != True:
-                        wordCoords = self.grid.findVerticalWordLetters(coords)
-                        if(len(wordCoords)>2):
-                            self.updateWordOptions(wordCoords)
-                        # Note that the word was updated
-                        for x1, y1 in wordCoords:
-                            verticalUpdated[y1][x1] = True
-                        
-            # Calculate new weight
-            new_total_options = self.grid.totalOptions()
-            
-            # Stop updating if no large improvement could be reached
-            if new_total_options >= old_total_options * 1.0:
-                break
-            else:
-                old_total_options = new_total_options
-        
+
+            changed = [(coords, slot) for coords in self.updateWordOptions(slot)]
+            for coords, source in changed:
+                # Stop updating as soon as a cell runs out of options
+                if self.isEmpty(coords):
+                    queue.clear()
+                    break
+
+                # Crossing words have to be checked against the removed letters
+                for crossingSlot in self.grid.findWordSlots(coords):
+                    if crossingSlot != source and crossingSlot not in queued:
+                        queue.append(crossingSlot)
+                        queued.add(crossingSlot)
+
+                if self.nogoods is not None:
+                    changed += [(nogoodCoords, None) for nogoodCoords in self.applyNogoods(coords)]
+
         endTime = time.perf_counter()
-        print("Updating options took: %.2gs and ran %d times" % (endTime-startTime, nUpdates))
+        self.metrics.count("propagations")
+        self.metrics.count("slot_evaluations", nUpdates)
+        self.metrics.addTime("propagation", endTime - startTime)
+        self.metrics.event("propagation", seconds=endTime - startTime, slots=nUpdates)
         return nUpdates
-    
-    def isFullyValid(self):
-        """Checks if every defined word is valid.
+
+    def isEmpty(self, coords):
+        """Checks if a cell ran out of options. Blocked cells are never empty.
+
+        Arguments:
+            coords (tuple): Coordinates of the cell.
+
+        Returns:
+            (bool): True if no letter is valid for the cell.
+        """
+        return not self.grid[coords].blocked and self.grid[coords].sumOptions() == 0
+
+    def isFullyValid(self, incremental=False):
+        """Checks if every defined word is valid. Words have to be unique, except that a row of a symmetric grid is the same slot as its column.
+
+        Arguments:
+            incremental (bool) - optional: If True, only slots evaluated by updateOptions since the last incremental check are validated. (Default: False)
 
         Returns:
             (bool): True if every full word is valid, False otherwise.
         """
-        all_words = self.grid.allWords()
-        for word in all_words:
+        if incremental:
+            return self.isPendingValid()
+
+        found = set()
+        for word in self.grid.allWords():
             # Word is not unique
-            if all_words.count(word)>1:
+            if word in found:
                 return False
             # Word is not valid
-            if word not in self.dictionary.lookup[len(word)]:
+            if not self.dictionary.contains(word):
                 return False
-            
-        return True
\ No newline at end of file
+            found.add(word)
+
+        return True
+
+    def isPendingValid(self):
+        """Validates the complete words of the slots evaluated since the last check, against the dictionary and the words validated before.
+
+        Returns:
+            (bool): True if every checked word is valid, False otherwise.
+        """
+        for slot in self.pendingSlots:
+            if slot in self.validSlots:
+                continue
+
+            # Skip if every letter is masked, or any letter is undefined
+            if all(self.grid[coords].mask for coords in slot):
+                continue
+            if not all(self.grid[coords].isDefined() for coords in slot):
+                continue
+
+            word = ''.join(self.grid[coords].getDefined() for coords in slot)
+            # Word is not unique or not valid
+            if word in self.validWords or not self.dictionary.contains(word):
+                if self.reasons is not None:
+                    self.conflict = self.slotReason(slot)
+                    for validSlot, validWord in self.validSlots.items():
+                        if validWord == word:
+                            self.conflict |= self.slotReason(validSlot)
+                return False
+
+            self.validSlots[slot] = word
+            self.validWords.add(word)
+            if self.trail is not None:
+                self.trail.append((self.invalidateSlot, (slot,)))
+
+        self.pendingSlots.clear()
+        return True
+
+    def invalidateSlot(self, slot):
+        """Removes the word of a slot from the validated words.
+
+        Arguments:
+            slot (tuple of tuples): Coordinates of the letters of the word.
+        """
+        self.validWords.discard(self.validSlots.pop(slot))
+
+    def resetValidity(self):
+        """Forgets every validated word, so the next incremental check validates every word slot.
+        """
+        self.validSlots = {}
+        self.validWords = set()
+        self.pendingSlots = set(self.grid.findWordSlots())
@@ -1,29 +1,91 @@
 from string import ascii_lowercase
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+from collections import OrderedDict
 
 lettersetHU = 'aábcdeéfghiíjklmnoóöőpqrstuúüűvwxyz'
 lettersetEN = ascii_lowercase
 
+# Prepared dictionaries are stored next to the input file with this suffix
+CACHE_SUFFIX = '.wfccache'
+# Has to be changed whenever the prepared data changes, so old caches are not loaded
+CACHE_VERSION = 2
+
+# First bytes of exported dictionaries, the last byte is the version of the layout
+EXPORT_MAGIC = b'WFCDICT\x01'
+
+def readExport(data, filename):
+    """Reads the header of an exported dictionary.
+
+    Arguments:
+        data (bytes-like): Contents of the file, read or memory mapped.
+        filename (string): Filename of the exported dictionary, for the error message.
+
+    Returns:
+        header (dict): Letters, and the offsets of the words and the bitsets of each length, see Dictionary.export.
+        buffer (memoryview): Data after the header, the offsets are relative to its start.
+    """
+    if data[:len(EXPORT_MAGIC)] != EXPORT_MAGIC:
+        raise ValueError("%s is not an exported dictionary" % filename)
+    headerStart = len(EXPORT_MAGIC) + 8
+    headerLength, = struct.unpack("<Q", data[len(EXPORT_MAGIC):headerStart])
+    header = json.loads(bytes(data[headerStart:headerStart + headerLength]).decode("utf-8"))
+    return header, memoryview(data)[headerStart + headerLength:]
+
+def isExported(filename):
+    """Checks if a file was written by Dictionary.export.
+
+    Arguments:
+        filename (string): Filename to check.
+
+    Returns:
+        (bool): True if the file is an exported dictionary.
+    """
+    with open(filename, "rb") as f:
+        return f.read(len(EXPORT_MAGIC)) == EXPORT_MAGIC
+
 class Dictionary(object):
     """Class for keeping track of and interacting with a dictionary of words.
 
     Attributes:
         words (list of strings): List of every valid word.
         validLetters (set of chars): Set of valid letters. Words containing invalid letters are removed.
+        letters (string): Valid letters concatenated in sorted order, so cells list options in the same order every run.
         lookup (dict of strings): List of every valid word organized into a dictionary by length.
+        index (dict of lists of dicts): Positional index, for each length, position and letter a bitset of the matching words in lookup.
+        wordSets (dict of frozensets): Every valid word organized by length, for constant time membership checks. None for attached dictionaries.
+        attachedFile (string): Exported file the dictionary is attached to, None if it was loaded into memory.
+        frequencyCache (FrequencyCache): Recently counted letter frequencies by the allowed letters of a slot, None if not enabled.
     """
 
-    def __init__(self, filename, maxLength=None, validLetters=None):
+    # Candidate sets up to this size are counted word by word in letterCounts
+    sparseLimit = 64
+
+    def __init__(self, filename, maxLength=None, validLetters=None, cache=False):
         """Initializes a new dictionary from an input file.
 
         Arguments:
             filename (string): Filename containing a list of words.
+            maxLength (int) - optional: Longer words are removed. (Default: No limit)
+            validLetters (iterable of chars) - optional: Words containing other letters are removed. (Default: Every letter is valid)
+            cache (bool) - optional: If True, the prepared dictionary is stored next to the input file, and loaded from there while the file and the arguments are unchanged. (Default: False)
         """
+        self.attachedFile = None
+        self.frequencyCache = None
+
+        if cache:
+            cacheFilename = filename + CACHE_SUFFIX
+            cacheKey = self.cacheKey(filename, maxLength, validLetters)
+            if self.loadCache(cacheFilename, cacheKey):
+                return
+
+        # Words are filtered while reading, without keeping the whole file in memory
         with open(filename, encoding="utf-8") as f:
-            # Stores the split results, which is all the words in the file.
-            self.words = [word.lower() for word in f.read().split()]
-        
-        # Perform an initial cleanup of the imported words
-        self.clean(maxLength, validLetters)
+            self.words = list(self.readWords(f, maxLength, validLetters))
 
         # Build letterset based on library
         self.findValidLetters()
@@ -31,40 +93,164 @@ class Dictionary(object):
         # Prepare for lookup
         self.prepareForLookup()
 
+        if cache:
+            self.saveCache(cacheFilename, cacheKey)
+
+    @classmethod
+    def fromWords(cls, words, maxLength=None, validLetters=None):
+        """Initializes a new dictionary from a list of words, instead of a file.
+
+        Arguments:
+            words (iterable of strings): Words of the dictionary.
+            maxLength (int) - optional: Longer words are removed. (Default: No limit)
+            validLetters (iterable of chars) - optional: Words containing other letters are removed. (Default: Every letter is valid)
+
+        Returns:
+            (Dictionary): New dictionary.
+        """
+        self = cls.__new__(cls)
+        self.attachedFile = None
+        self.frequencyCache = None
+        self.words = list(cls.readWords(words, maxLength, validLetters))
+        self.findValidLetters()
+        self.prepareForLookup()
+        return self
+
+    @staticmethod
+    def isValidWord(word, maxLength=None, validLetters=None):
+        """Checks if a word can be used.
+
+        Arguments:
+            word (string): Word to check.
+            maxLength (int) - optional: Maximum length of the word. (Default: No limit)
+            validLetters (iterable of chars) - optional: Letters the word can contain. (Default: Every letter is valid)
+
+        Returns:
+            (bool): True if word can be used.
+        """
+        # Check 1: Contains only alpha chars
+        # This check is always active
+        if not word.isalpha():
+            return False
+
+        # Check 2: Contains only valid letters
+        if validLetters and any(letter not in validLetters for letter in word):
+            return False
+
+        # Check 3: No longer than max length
+        if maxLength and len(word) > maxLength:
+            return False
+
+        return True
+
+    @classmethod
+    def readWords(cls, lines, maxLength=None, validLetters=None):
+        """Yields every valid word once, in order of first appearance.
+
+        Arguments:
+            lines (iterable of strings): Lines of whitespace separated words.
+            maxLength (int) - optional: Longer words are skipped. (Default: No limit)
+            validLetters (iterable of chars) - optional: Words containing other letters are skipped. (Default: Every letter is valid)
+        """
+        if validLetters:
+            validLetters = set(validLetters)
+        seen = set()
+        for line in lines:
+            for word in line.split():
+                word = word.lower()
+                if word not in seen and cls.isValidWord(word, maxLength, validLetters):
+                    seen.add(word)
+                    yield word
+
     def clean(self, maxLength=None, validLetters=None):
-        """Initializes a new dictionary from an input file.
+        """Removes invalid and duplicate words.
+
+        Arguments:
+            maxLength (int) - optional: Longer words are removed. (Default: No limit)
+            validLetters (iterable of chars) - optional: Words containing other letters are removed. (Default: Every letter is valid)
+        """
+        self.words = list(self.readWords(self.words, maxLength, validLetters))
+
+    @staticmethod
+    def cacheKey(filename, maxLength=None, validLetters=None):
+        """Identifies a prepared dictionary, by the contents of the input file and the cleaning arguments.
 
         Arguments:
             filename (string): Filename containing a list of words.
+            maxLength (int) - optional: Maximum length of the words.
+            validLetters (iterable of chars) - optional: Letters the words can contain.
+
+        Returns:
+            (bytes): Hash of the input file and the arguments.
+        """
+        key = hashlib.sha256()
+        with open(filename, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                key.update(chunk)
+        key.update(repr((CACHE_VERSION, maxLength, ''.join(sorted(validLetters)) if validLetters else None)).encode("utf-8"))
+        return key.hexdigest().encode("ascii")
+
+    def loadCache(self, cacheFilename, cacheKey):
+        """Loads a prepared dictionary, if the cache file exists and was made with the same key.
+        The cache has the layout of export, its words and bitsets are decoded into memory, so nothing in the file is ever executed.
+
+        Arguments:
+            cacheFilename (string): Filename of the cache.
+            cacheKey (bytes): Key returned by cacheKey.
+
+        Returns:
+            (bool): True if the dictionary was loaded.
+        """
+        try:
+            with open(cacheFilename, "rb") as f:
+                data = f.read()
+            header, buffer = readExport(data, cacheFilename)
+            if header.get("key") != cacheKey.decode("ascii"):
+                return False
+            letters = header["letters"]
+            lookup = {}
+            index = {}
+            for length, bucket in header["lengths"].items():
+                length = int(length)
+                size = (bucket["count"] + 7) >> 3
+                lookup[length] = list(MappedWords(buffer, bucket["words"], length, bucket["count"], letters))
+                index[length] = [dict(MappedBitsets(buffer, offsets, size).items()) for offsets in bucket["index"]]
+        except Exception:
+            # Missing, truncated or otherwise broken cache, prepare the dictionary again
+            return False
+        self.letters = letters
+        self.validLetters = set(letters)
+        self.lookup = lookup
+        self.index = index
+        self.words = [word for length in sorted(lookup) for word in lookup[length]]
+        self.buildWordSets()
+        return True
+
+    def saveCache(self, cacheFilename, cacheKey):
+        """Stores the prepared dictionary, in the layout of export. Failing to write the cache is not an error, the dictionary is prepared again next time.
+
+        Arguments:
+            cacheFilename (string): Filename of the cache.
+            cacheKey (bytes): Key returned by cacheKey.
         """
-        # Iterate through a copy, so items can be removed from the original
-        for word in self.words[:]:
-            # Check 1: Contains only alpha chars
-            # This check is always active
-            if not word.isalpha():
-                self.words.remove(word)
-                continue
-
-            # Check 2: Contains only valid letters
-            if validLetters:
-                if any([letter not in validLetters for letter in word]):
-                    self.words.remove(word)
-                    continue
-
-            # Check 3: No longer than max length
-            if maxLength:
-                if len(word) > maxLength:
-                    self.words.remove(word)
-                    continue
+        temporaryFilename = cacheFilename + ".tmp"
+        try:
+            self.export(temporaryFilename, cacheKey.decode("ascii"))
+            # Replace in one step, so a concurrent start never sees a partial file
+            os.replace(temporaryFilename, cacheFilename)
+        except (OSError, ValueError):
+            pass
 
     def setValidLetters(self, validLetters):
-        """Initializes a new dictionary from an input file.
+        """Removes words containing letters that are not valid.
 
         Arguments:
-            filename (string): Filename containing a list of words.
+            validLetters (iterable of chars): Valid letters.
         """
         self.validLetters = validLetters
+        self.letters = ''.join(sorted(self.validLetters))
         self.clean(validLetters=validLetters)
+        self.prepareForLookup()
 
     def findValidLetters(self):
         """Initializes a new dictionary from an input file.
@@ -76,6 +262,7 @@ class Dictionary(object):
         for word in self.words:
             for letter in word:
                 self.validLetters.add(letter)
+        self.letters = ''.join(sorted(self.validLetters))
     
     def prepareForLookup(self):
         """Initializes a new dictionary from an input file.
@@ -87,4 +274,368 @@ class Dictionary(object):
                 self.lookup[length] = []
             self.lookup[length].append(word)
 
-        
\ No newline at end of file
+        self.buildWordSets()
+        self.buildIndex()
+
+        # Frequencies of the old words no longer hold
+        if self.frequencyCache is not None:
+            self.frequencyCache.clear()
+
+    def buildWordSets(self):
+        """Builds a set of words for each length, so words can be checked without scanning the lookup lists.
+        """
+        self.wordSets = {length: frozenset(words) for length, words in self.lookup.items()}
+
+    def contains(self, word):
+        """Checks if a word is in the dictionary.
+
+        Arguments:
+            word (string): Word to check.
+
+        Returns:
+            (bool): True if the word is valid.
+        """
+        if self.wordSets is None:
+            # Attached dictionaries check the positional index instead, so words are not loaded into memory
+            return self.matchingWords(word) != 0
+        return word in self.wordSets.get(len(word), ())
+
+    def __deepcopy__(self, memo):
+        """The dictionary is never modified during solving, so snapshots can share the same instance.
+        """
+        return self
+
+    def buildIndex(self):
+        """Builds the positional index. For each word length, position and letter, a bitset is stored, where bit i is set if lookup[length][i] has that letter in that position.
+        """
+        self.index = {}
+        for length, words in self.lookup.items():
+            # Collect bits in bytearrays first, growing python ints bit by bit would be quadratic
+            buffers = [{} for position in range(length)]
+            for i, word in enumerate(words):
+                byte, bit = i >> 3, 1 << (i & 7)
+                for position, letter in enumerate(word):
+                    if letter not in buffers[position]:
+                        buffers[position][letter] = bytearray((len(words) + 7) >> 3)
+                    buffers[position][letter][byte] |= bit
+            self.index[length] = [{letter: int.from_bytes(buffer, 'little') for letter, buffer in positions.items()} for positions in buffers]
+
+    def positionMask(self, length, position, letters):
+        """Finds the words that have any of the given letters in a given position.
+
+        Arguments:
+            length (int): Length of the words.
+            position (int): Position of the letter in the word.
+            letters (iterable of chars): Allowed letters.
+
+        Returns:
+            mask (int): Bitset of matching words in lookup[length].
+        """
+        positions = self.index.get(length)
+        if positions is None:
+            return 0
+        mask = 0
+        for letter in letters:
+            mask |= positions[position].get(letter, 0)
+        return mask
+
+    def matchingWords(self, allowedLetters):
+        """Finds every word that matches the allowed letters in each position.
+
+        Arguments:
+            allowedLetters (list of iterables): Allowed letters for each position.
+
+        Returns:
+            candidates (int): Bitset of matching words in lookup[len(allowedLetters)].
+        """
+        length = len(allowedLetters)
+        if length not in self.index:
+            return 0
+        candidates = (1 << len(self.lookup[length])) - 1
+        for position, letters in enumerate(allowedLetters):
+            candidates &= self.positionMask(length, position, letters)
+            if not candidates:
+                break
+        return candidates
+
+    def letterCounts(self, candidates, allowedLetters):
+        """Counts how many of the candidate words have each allowed letter in each position.
+
+        Arguments:
+            candidates (int): Bitset of words in lookup[len(allowedLetters)].
+            allowedLetters (list of iterables): Allowed letters for each position.
+
+        Returns:
+            frequencies (list of dicts): Letter frequencies for each position.
+        """
+        frequencies = [{} for letters in allowedLetters]
+        if not candidates:
+            return frequencies
+        positions = self.index[len(allowedLetters)]
+
+        # Few survivors are cheaper to count one by one than by scanning every bitset
+        if candidates.bit_count() <= self.sparseLimit:
+            words = self.lookup[len(allowedLetters)]
+            while candidates:
+                lowest = candidates & -candidates
+                candidates ^= lowest
+                for position, letter in enumerate(words[lowest.bit_length() - 1]):
+                    frequencies[position][letter] = frequencies[position].get(letter, 0) + 1
+            return frequencies
+
+        for position, letters in enumerate(allowedLetters):
+            for letter in letters:
+                count = (candidates & positions[position].get(letter, 0)).bit_count()
+                if count:
+                    frequencies[position][letter] = count
+        return frequencies
+
+    def candidateIndexes(self, length, candidates, limit, start=0):
+        """Lists the indexes of candidate words, going around from a start index.
+
+        Arguments:
+            length (int): Length of the words.
+            candidates (int): Bitset of words in lookup[length].
+            limit (int): Maximum number of indexes to list.
+            start (int) - optional: Index to start from, the candidates before it are listed after the last one. (Default: 0)
+
+        Returns:
+            (generator of ints): Indexes of the candidates in lookup[length].
+        """
+        size = len(self.lookup.get(length, ()))
+        start = start % size if size else 0
+        # Rotate the bitset, so the lowest bits are the candidates from the start index
+        rotated = (candidates >> start) | ((candidates & ((1 << start) - 1)) << (size - start))
+        while rotated and limit > 0:
+            lowest = rotated & -rotated
+            rotated ^= lowest
+            limit -= 1
+            yield (lowest.bit_length() - 1 + start) % size
+
+    def enableFrequencyCache(self, maxEntries=100000, maxBytes=64 * 2**20):
+        """Starts caching letter frequencies by the allowed letters of a slot, see FrequencyCache.
+
+        Arguments:
+            maxEntries (int) - optional: Maximum number of cached frequency tables. (Default: 100000)
+            maxBytes (int) - optional: Maximum estimated memory of the cached tables. (Default: 64 MiB)
+        """
+        self.frequencyCache = FrequencyCache(maxEntries, maxBytes)
+
+    def export(self, filename, key=None):
+        """Writes the word buckets and the positional index into a flat binary file, which can be memory mapped by attach.
+        Words are stored as one byte letter indexes, bitsets as little endian bytes. Offsets are listed in a JSON header.
+
+        Arguments:
+            filename (string): Filename to write.
+            key (string) - optional: Stored in the header, e.g. the key of a cache, see loadCache. (Default: None)
+        """
+        letterIndex = {letter: i for i, letter in enumerate(self.letters)}
+        if len(letterIndex) > 256:
+            raise ValueError("Only dictionaries with up to 256 letters can be exported")
+
+        blocks = []
+        offset = 0
+        def addBlock(data):
+            nonlocal offset
+            blocks.append(data)
+            start = offset
+            offset += len(data)
+            return start
+
+        lengths = {}
+        for length, words in self.lookup.items():
+            size = (len(words) + 7) >> 3
+            lengths[length] = {
+                "count": len(words),
+                "words": addBlock(b''.join(bytes(letterIndex[letter] for letter in word) for word in words)),
+                "index": [{letter: addBlock(mask.to_bytes(size, 'little')) for letter, mask in positions.items()} for positions in self.index[length]],
+            }
+
+        header = json.dumps({"letters": self.letters, "lengths": lengths, "key": key}, ensure_ascii=False).encode("utf-8")
+        with open(filename, "wb") as f:
+            f.write(EXPORT_MAGIC)
+            f.write(struct.pack("<Q", len(header)))
+            f.write(header)
+            for block in blocks:
+                f.write(block)
+
+    @classmethod
+    def attach(cls, filename, cacheLimits=None):
+        """Opens a dictionary written by export, without loading it into memory. The file is memory mapped, so processes attached to the same file share its pages.
+        Words are decoded when accessed, bitsets of the positional index are read once, on first use.
+
+        Arguments:
+            filename (string): Filename of the exported dictionary.
+            cacheLimits (tuple) - optional: Maximum entries and bytes of a new frequency cache, see enableFrequencyCache. (Default: No cache)
+
+        Returns:
+            (Dictionary): Attached dictionary.
+        """
+        with open(filename, "rb") as f:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        header, buffer = readExport(data, filename)
+
+        self = cls.__new__(cls)
+        self.attachedFile = filename
+        self.frequencyCache = None
+        if cacheLimits is not None:
+            self.enableFrequencyCache(*cacheLimits)
+        self.letters = header["letters"]
+        self.validLetters = set(self.letters)
+        self.wordSets = None
+        self.lookup = {}
+        self.index = {}
+        for length, bucket in header["lengths"].items():
+            length = int(length)
+            size = (bucket["count"] + 7) >> 3
+            self.lookup[length] = MappedWords(buffer, bucket["words"], length, bucket["count"], self.letters)
+            self.index[length] = [MappedBitsets(buffer, offsets, size) for offsets in bucket["index"]]
+        self.words = MappedWordList(self.lookup)
+        return self
+
+    def __reduce__(self):
+        # Attached dictionaries are sent to other processes as the filename only, they attach to the same file
+        if self.attachedFile is not None:
+            # Every process fills its own frequency cache, with the same limits
+            cacheLimits = self.frequencyCache.limits() if self.frequencyCache is not None else None
+            return (Dictionary.attach, (self.attachedFile, cacheLimits))
+        return super(Dictionary, self).__reduce__()
+
+class FrequencyCache(object):
+    """Least recently used cache of letter frequencies, keyed by the allowed letters of each position of a slot.
+    The same allowed letters come up again and again during the search, e.g. after backtracking and in sibling branches, and always have the same frequencies.
+
+    Attributes:
+        maxEntries (int): Maximum number of cached frequency tables.
+        maxBytes (int): Maximum estimated memory of the cached tables.
+        size (int): Estimated memory of the cached tables.
+        hits (int): Number of lookups found in the cache.
+        misses (int): Number of lookups not found in the cache.
+    """
+
+    def __init__(self, maxEntries=100000, maxBytes=64 * 2**20):
+        self.maxEntries = maxEntries
+        self.maxBytes = maxBytes
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def limits(self):
+        """Returns the limits of the cache, to create an empty cache with the same limits.
+
+        Returns:
+            (tuple): Maximum entries and bytes.
+        """
+        return (self.maxEntries, self.maxBytes)
+
+    def get(self, key):
+        """Looks up the frequencies of a slot.
+
+        Arguments:
+            key (tuple): Length of the slot, and the allowed letters of each position in the order of Dictionary.letters.
+
+        Returns:
+            frequencies (list of dicts): Letter frequencies for each position, None if not cached. Shared with the cache, must not be changed.
+        """
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return entry[0]
+
+    def put(self, key, frequencies):
+        """Stores the frequencies of a slot, evicting the least recently used ones over the limits.
+
+        Arguments:
+            key (tuple): Length of the slot, and the allowed letters of each position in the order of Dictionary.letters.
+            frequencies (list of dicts): Letter frequencies for each position.
+        """
+        if key in self.entries:
+            return
+        size = sys.getsizeof(key) + sys.getsizeof(key[1]) + sum(sys.getsizeof(letters) for letters in key[1]) + sum(sys.getsizeof(counts) for counts in frequencies)
+        self.entries[key] = (frequencies, size)
+        self.size += size
+        while self.entries and (len(self.entries) > self.maxEntries or self.size > self.maxBytes):
+            _, (_, evictedSize) = self.entries.popitem(last=False)
+            self.size -= evictedSize
+
+    def clear(self):
+        """Removes every entry, the counters are kept.
+        """
+        self.entries.clear()
+        self.size = 0
+
+class MappedWords(object):
+    """Read-only list of words of the same length, decoded from a memory mapped buffer when accessed.
+    """
+
+    def __init__(self, buffer, offset, length, count, letters):
+        self.buffer = buffer
+        self.offset = offset
+        self.length = length
+        self.count = count
+        # Letter indexes are decoded as latin-1 characters, then translated to the letters
+        self.decoding = {i: letter for i, letter in enumerate(letters)}
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i):
+        if not 0 <= i < self.count:
+            raise IndexError("Word index out of range")
+        start = self.offset + i * self.length
+        return bytes(self.buffer[start:start + self.length]).decode("latin-1").translate(self.decoding)
+
+    def __iter__(self):
+        for i in range(self.count):
+            yield self[i]
+
+class MappedWordList(object):
+    """Read-only list of every word of an attached dictionary, in order of length.
+    """
+
+    def __init__(self, lookup):
+        self.lookup = lookup
+
+    def __len__(self):
+        return sum(len(words) for words in self.lookup.values())
+
+    def __iter__(self):
+        for length in sorted(self.lookup):
+            yield from self.lookup[length]
+
+class MappedBitsets(object):
+    """Bitsets of a single position of the positional index, read from a memory mapped buffer on first use.
+    Behaves like the letter to bitset dicts of a dictionary loaded into memory.
+    """
+
+    def __init__(self, buffer, offsets, size):
+        self.buffer = buffer
+        self.offsets = offsets
+        self.size = size
+        self.masks = {}
+
+    def get(self, letter, default=None):
+        if letter not in self.masks:
+            if letter not in self.offsets:
+                return default
+            offset = self.offsets[letter]
+            self.masks[letter] = int.from_bytes(self.buffer[offset:offset + self.size], 'little')
+        return self.masks[letter]
+
+    def __contains__(self, letter):
+        return letter in self.offsets
+
+    def __iter__(self):
+        return iter(self.offsets)
+
+    def items(self):
+        for letter in self.offsets:
+            yield letter, self.get(letter)
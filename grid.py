@@ -1,5 +1,13 @@
 import cell
 import random
+import heapq
+from copy import deepcopy
+
+try:
+    import numpy
+except ImportError:
+    # Only needed for the "numpy" storage
+    numpy = None
 
 class Grid(object):
     """Class for keeping track of and interacting with a rectangular grid.
@@ -8,18 +16,60 @@ class Grid(object):
         width (int): Width of the grid.
         height (int): Height of the grid.
         cells (2D list of cells): Cells of the grid.
+        slots (list of tuples): Coordinates of every horizontal and vertical run of unblocked cells, None if the layout changed since it was built.
+        slotIds (2D list of tuples): Index of the horizontal and vertical slot of each cell in slots.
+        weights (array): Letter weights of every cell with shape (height, width, letters) if the "numpy" storage is used, None otherwise.
+        blockedCells (array): Blocked flag of every cell with shape (height, width) if the "numpy" storage is used, None otherwise.
+        mirroredCells (array): True for every cell below the diagonal of a symmetric grid, these are left out of the arrays, with shape (height, width) if the "numpy" storage is used, None otherwise.
+        symmetric (bool): If True, cell (x, y) is the same cell as (y, x), so every row reads the same as the column with the same index. Only the cells with x >= y are stored.
+        entropyTracker (EntropyTracker): Keeps track of the minimum entropy cell if enabled, None otherwise.
     """
 
-    def __init__(self, size, letterset):
+    def __init__(self, size, letterset, storage="dict", symmetric=False):
         """Initializes a new grid of given size.
 
         Arguments:
             size (tuple): Width and height of the grid
+            letterset (string): All valid letters concatenated.
+            storage (str) - optional: "dict" to store options of cells in dicts, "compact" to store them in weight arrays and bitmasks, "numpy" to store the weights of every cell in a single array, so the whole grid can be evaluated at once. (Default: "dict")
+            symmetric (bool) - optional: If True, cell (x, y) is the same cell as (y, x), for symmetric word squares. Requires a square grid. (Default: False)
         """
         self.width, self.height = size
+        if symmetric and self.width != self.height:
+            raise ValueError("A symmetric grid has to be square, not %dx%d" % size)
+        self.symmetric = symmetric
+        self.weights = None
+        self.blockedCells = None
+        self.mirroredCells = None
+        self.entropyTracker = None
 
         # Initially every letter is an option for every field
-        self.cells = [[cell.Cell(cell.Coords(x, y), letterset) for x in range(self.width)] for y in range(self.height)]
+        if storage == "dict":
+            self.cells = [[cell.Cell(cell.Coords(x, y), letterset) for x in range(self.width)] for y in range(self.height)]
+        elif storage == "compact":
+            self.cells = [[cell.CompactCell(cell.Coords(x, y), letterset) for x in range(self.width)] for y in range(self.height)]
+        elif storage == "numpy":
+            if numpy is None:
+                raise ImportError("The numpy storage requires NumPy to be installed")
+            self.weights = numpy.zeros((self.height, self.width, len(letterset)), dtype=numpy.uint32)
+            self.blockedCells = numpy.zeros((self.height, self.width), dtype=bool)
+            self.mirroredCells = numpy.zeros((self.height, self.width), dtype=bool)
+            self.cells = [[cell.TensorCell(cell.Coords(x, y), letterset, self.weights[y, x], self.blockedCells[y, x:x+1]) for x in range(self.width)] for y in range(self.height)]
+        else:
+            raise ValueError("Unknown cell storage: %s" % storage)
+
+        if symmetric:
+            # Cells below the diagonal are replaced by their mirror image, their own storage is never used
+            for y in range(self.height):
+                for x in range(y):
+                    self.cells[y][x] = self.cells[x][y]
+            if self.mirroredCells is not None:
+                self.mirroredCells[:] = numpy.tri(self.height, self.width, -1, dtype=bool)
+
+        # Slot table is built on first use, and rebuilt whenever a cell is blocked or unblocked
+        self.slots = None
+        for gridCell in self:
+            gridCell.layoutListener = self.invalidateSlots
     
     def __getitem__(self, coords) -> cell:
         x,y = coords
@@ -32,19 +82,81 @@ class Grid(object):
         x,y = coords
         if 0 <= x < self.width and 0 <= y < self.height:
             self.cells[y][x] = cell
+            if self.symmetric:
+                self.cells[x][y] = cell
         else:
             raise IndexError("Grid index out of range")
 
     def __iter__(self):
+        # Mirrored cells are only visited once
         for y in range(self.height):
-            for x in range(self.width):
+            for x in range(y if self.symmetric else 0, self.width):
                 yield self.cells[y][x]
+
+    def canonical(self, coords):
+        """Returns the coordinates a cell is stored at, (x, y) with x >= y for a symmetric grid.
+
+        Arguments:
+            coords (tuple): Coordinates of the cell.
+
+        Returns:
+            (tuple): Coordinates of the stored cell.
+        """
+        x, y = coords
+        if self.symmetric and x < y:
+            return (y, x)
+        return (x, y)
     
+    def __deepcopy__(self, memo):
+        copied = Grid.__new__(Grid)
+        memo[id(self)] = copied
+        if self.slots is not None:
+            # Slot table is replaced, never changed, so copies can share it
+            for table in (self.slots, self.slotIds, self.cellWordSlots, self.wordSlots):
+                memo[id(table)] = table
+        if self.weights is not None:
+            # Views of the cells have to point into the copied arrays
+            weights = memo[id(self.weights)] = self.weights.copy()
+            blockedCells = memo[id(self.blockedCells)] = self.blockedCells.copy()
+            memo[id(self.mirroredCells)] = self.mirroredCells
+            for cell in self:
+                x, y = cell.coords
+                memo[id(cell.weights)] = weights[y, x]
+                memo[id(cell.blockedFlag)] = blockedCells[y, x:x+1]
+        for key, value in self.__dict__.items():
+            setattr(copied, key, deepcopy(value, memo))
+        return copied
+
     def reset(self):
         # Only reset cells that are not masked
         for cell in self:
             if not cell.mask:
                 cell.reset()
+        self.resetEntropyTracker()
+
+    def trackEntropy(self, noise=None):
+        """Enables keeping track of the minimum entropy cell, so findMinEntropy does not have to check every cell.
+        Every change of a cell has to be reported by calling entropyChanged.
+
+        Arguments:
+            noise (float) - optional: Level of noise mixed into the entropies, the same way as findMinEntropy does. (Default: No noise, ties are broken in row-major order)
+        """
+        self.entropyTracker = EntropyTracker(self, noise)
+
+    def resetEntropyTracker(self):
+        """Re-evaluates every cell of the entropy tracker, if it is enabled.
+        """
+        if self.entropyTracker is not None:
+            self.entropyTracker.reset()
+
+    def entropyChanged(self, coords):
+        """Notifies the entropy tracker about a changed cell, if it is enabled.
+
+        Arguments:
+            coords (tuple): Coordinates of the changed cell.
+        """
+        if self.entropyTracker is not None:
+            self.entropyTracker.changed.add(coords)
     
     def isFullyDefined(self) -> bool:
         """Checks if there's a single letter defined for every cell.
@@ -52,19 +164,25 @@ class Grid(object):
         Returns:
             (bool): True if single letter is defined for every cell, False otherwise.
         """
+        if self.weights is not None:
+            return bool(self.definedCells().all())
+
         for cell in self:
             if not cell.isDefined():
                 return False
         return True
 
     def isDeadend(self) -> bool:
-        """Checks if crossword is a deadend, meaning there's at least one cell with no valid options.
+        """Checks if crossword is a deadend, meaning there's at least one cell with no valid options. Blocked cells are not considered.
 
         Returns:
             (bool): True if crossword is deadend, False otherwise.
         """
+        if self.weights is not None:
+            return bool(((self.weights.sum(axis=2) == 0) & ~self.blockedCells & ~self.mirroredCells).any())
+
         for cell in self:
-            if cell.sumOptions() == 0:
+            if not cell.blocked and cell.sumOptions() == 0:
                 return True
         return False
     
@@ -74,8 +192,74 @@ class Grid(object):
         Returns:
             (int): Total number of valid letters.
         """
+        if self.weights is not None:
+            return int(self.weights.sum())
+
         return sum(cell.sumOptions() for cell in self)
     
+    def updateSlots(self):
+        """Builds the slot table: the coordinates of every horizontal and vertical run of unblocked cells, and the runs crossing each cell.
+        Only needs to be done again if a cell is blocked or unblocked.
+        """
+        self.slots = []
+        horizontal = [[None for x in range(self.width)] for y in range(self.height)]
+        vertical = [[None for x in range(self.width)] for y in range(self.height)]
+
+        # Slots of a symmetric grid are made up of the stored cells, so each column is the same slot as the row with the same index
+        slotIndexes = {}
+        for lines, table in (([[(x, y) for x in range(self.width)] for y in range(self.height)], horizontal),
+                             ([[(x, y) for y in range(self.height)] for x in range(self.width)], vertical)):
+            for line in lines:
+                run = []
+                # A blocked cell (or the end of the line) closes the current run
+                for coords in line + [None]:
+                    if coords is not None and not self[coords].blocked:
+                        run.append(coords)
+                    elif run:
+                        slot = tuple(self.canonical(coords) for coords in run)
+                        if slot not in slotIndexes:
+                            slotIndexes[slot] = len(self.slots)
+                            self.slots.append(slot)
+                        for x, y in run:
+                            table[y][x] = slotIndexes[slot]
+                        run = []
+
+        self.slotIds = [[(horizontal[y][x], vertical[y][x]) for x in range(self.width)] for y in range(self.height)]
+
+        # Words of 2 letters or shorter are not considered, slots crossing themselves on the diagonal only once
+        self.cellWordSlots = [[tuple(self.slots[i] for i in dict.fromkeys(self.slotIds[y][x]) if i is not None and len(self.slots[i]) > 2) for x in range(self.width)] for y in range(self.height)]
+        self.wordSlots = [slot for slot in self.slots if len(slot) > 2]
+
+    def invalidateSlots(self):
+        """Marks the slot table as outdated, it is rebuilt when it is needed next time.
+        """
+        self.slots = None
+
+    def slotTable(self):
+        """Returns the slot table, rebuilding it if the layout changed.
+
+        Returns:
+            slots (list of tuples): Coordinates of the letters of every run of unblocked cells.
+        """
+        if self.slots is None:
+            self.updateSlots()
+        return self.slots
+
+    def findWordSlots(self, coords=None) -> list[tuple[tuple[int]]]:
+        """Finds the words crossing a cell, or every word of the grid. Words of 2 letters or shorter are not considered.
+
+        Arguments:
+            coords (tuple) - optional: Coordinates of the cell. (Default: Every word of the grid)
+
+        Returns:
+            (list of tuples): Coordinates of the letters of each word.
+        """
+        self.slotTable()
+        if coords is None:
+            return self.wordSlots
+        x, y = coords
+        return self.cellWordSlots[y][x]
+
     def findHorizontalWordLetters(self, coords) -> list[tuple[int]]:
         """Finds the coordinates for each letter of a horizontal word.
 
@@ -87,21 +271,9 @@ class Grid(object):
         """
         if self[coords].blocked:
             return []
-        
-        x, y = coords
 
-        # Step backwards on the X-axis, until hitting the end, or a blocked cell. That's the start.
-        xStart = x
-        while (xStart > 0) and not self[(xStart-1, y)].blocked:
-            xStart -= 1
-        
-        # Step forwards on the X-axis, until hitting the end, or a blocked cell. That's the end.
-        xEnd = x
-        while (xEnd < self.width) and not self[(xEnd, y)].blocked:
-            xEnd += 1
-
-        # Add every coordinate from start to end.
-        return [(x,y) for x in range(xStart, xEnd)]
+        x, y = coords
+        return list(self.slotTable()[self.slotIds[y][x][0]])
 
     def findVerticalWordLetters(self, coords) -> list[tuple[int]]:
         """Finds the coordinates for each letter of a vertical word.
@@ -114,21 +286,9 @@ class Grid(object):
         """
         if self[coords].blocked:
             return []
-        
-        x, y = coords
-
-        # Step backwards along the Y-axis, until hitting the end, or a blocked cell. That's the start.
-        yStart = y
-        while (yStart > 0) and not self[(x, yStart-1)].blocked:
-            yStart -= 1
-        
-        # Step forwards along the Y-axis, until hitting the end, or a blocked cell. That's the end.
-        yEnd = y
-        while (yEnd < self.height) and not self[(x, yEnd)].blocked:
-            yEnd += 1
 
-        # Add every coordinate from start to end.
-        return [(x,y) for y in range(yStart, yEnd)]
+        x, y = coords
+        return list(self.slotTable()[self.slotIds[y][x][1]])
     
     def findMinEntropy(self, noise=None) -> tuple[int]:
         """Finds the coordinates with the lowest entropy (e.g. the "most likely" letter)
@@ -139,12 +299,17 @@ class Grid(object):
         Returns:
             minEntropyCoords (tuple): Coorinates of the cell with the minimum entropy.
         """
-        
+        if self.entropyTracker is not None:
+            return self.entropyTracker.findMin()
+
+        if self.weights is not None:
+            return self.findMinEntropyVectorized(noise)
+
         minEntropyCoords = (0, 0)
         minEntropy = 1000
 
         for y in range(self.height):
-            for x in range(self.width): 
+            for x in range(y if self.symmetric else 0, self.width):
                 coords = (x,y)
 
                 # Skip the cell if it is already defined.
@@ -162,48 +327,123 @@ class Grid(object):
                     minEntropyCoords = coords
         return minEntropyCoords
 
+    def definedCells(self):
+        """Checks every cell at once, if there's only a single letter defined or the cell is blocked. Mirrored cells of a symmetric grid count as defined. Requires the "numpy" storage.
+
+        Returns:
+            (array): True for every cell that is defined, with shape (height, width).
+        """
+        return ((self.weights > 0).sum(axis=2) == 1) | self.blockedCells | self.mirroredCells
+
+    def entropies(self):
+        """Calculates the Shannon entropy of every cell at once. Requires the "numpy" storage.
+
+        Returns:
+            (array): Entropy of every cell (in bits), with shape (height, width). Empty cells have 0 entropy.
+        """
+        weights = self.weights.astype(numpy.float64)
+        sums = weights.sum(axis=2, keepdims=True)
+        probabilities = numpy.divide(weights, sums, out=numpy.zeros_like(weights), where=sums > 0)
+        logs = numpy.log(probabilities, out=numpy.zeros_like(weights), where=probabilities > 0)
+        return -(probabilities * logs).sum(axis=2)
+
+    def findMinEntropyVectorized(self, noise=None) -> tuple[int]:
+        """Same as findMinEntropy, but evaluates every cell at once. Requires the "numpy" storage.
+        """
+        entropies = self.entropies()
+
+        # Add some noise to mix things up a little
+        if noise:
+            generator = numpy.random.default_rng(random.getrandbits(64))
+            entropies -= noise * generator.random(entropies.shape) / 1000
+
+        # Skip the cells that are already defined.
+        entropies[self.definedCells()] = numpy.inf
+
+        y, x = numpy.unravel_index(numpy.argmin(entropies), entropies.shape)
+        if entropies[y, x] == numpy.inf:
+            return (0, 0)
+        return (int(x), int(y))
+
     def allWords(self) -> list[str]:
+        """Collects every fully defined word. Words of 2 letters or shorter, and words made up of masked cells only are skipped.
+
+        Returns:
+            words (list of str): Every fully defined word.
+        """
         words = []
-        verticalChecked = [[False for x in range(self.width)] for y in range(self.height)]
-        horizontalChecked = [[False for x in range(self.width)] for y in range(self.height)]
+        for slot in self.findWordSlots():
+            # Skip if every letter is masked
+            if all(self[letterCoords].mask for letterCoords in slot):
+                continue
 
-        for y in range(self.height):
-            for x in range(self.width):
-                coords = (x,y)
+            # Skip if any letter is undefined
+            if not all(self[letterCoords].isDefined() for letterCoords in slot):
+                continue
 
-                # Skip if not part of a word
-                if self[coords].blocked or self[coords].mask:
-                    continue
-                
-                # Check horizontal word
-                if not horizontalChecked[y][x]:
-                    horizontalCoords = self.findHorizontalWordLetters(coords)
-                    # Skip if 2 letters or shorter:
-                    if len(horizontalCoords) > 2:
-                        # Skip if any letter is undefined
-                        if not all(self[letterCoords].isDefined() for letterCoords in horizontalCoords):
-                            continue
-
-                        # Add word to list
-                        words.append(''.join([self[letterCoords].getDefined() for letterCoords in horizontalCoords]))
-                        # Mark all letters are checked
-                        for letterCoords in horizontalCoords:
-                            u,v = letterCoords
-                            horizontalChecked[v][u] = True
-                
-                # Same, but vertical
-                if not verticalChecked[y][x]:
-                    verticalCoords = self.findHorizontalWordLetters(coords)
-                    # Skip if 2 letters or shorter:
-                    if len(verticalCoords) > 2:
-                        # Skip if any letter is undefined
-                        if not all(self[letterCoords].isDefined() for letterCoords in verticalCoords):
-                            continue
-
-                        # Add word to list
-                        words.append(''.join([self[letterCoords].getDefined() for letterCoords in verticalCoords]))
-                        # Mark all letters are checked
-                        for letterCoords in verticalCoords:
-                            u,v = letterCoords
-                            verticalChecked[v][u] = True
-        return words
\ No newline at end of file
+            words.append(''.join([self[letterCoords].getDefined() for letterCoords in slot]))
+        return words
+
+class EntropyTracker(object):
+    """Min-heap of cell entropies. Changed cells are only re-evaluated when the minimum is requested, outdated heap entries are skipped lazily.
+
+    Attributes:
+        grid (Grid): Grid of the tracked cells.
+        noise (float): Level of noise mixed into the entropies.
+        heap (list of tuples): Entropy, row, column and version of cells.
+        versions (dict): Current version for the coordinates of each cell, older heap entries are outdated.
+        changed (set of tuples): Coordinates of cells changed since the last evaluation.
+    """
+
+    def __init__(self, grid, noise=None):
+        self.grid = grid
+        self.noise = noise
+        self.reset()
+
+    def reset(self):
+        """Re-evaluates every cell.
+        """
+        self.heap = []
+        self.versions = {}
+        self.changed = set(cell.coords for cell in self.grid)
+
+    def findMin(self) -> tuple[int]:
+        """Finds the coordinates with the lowest entropy, the same way as Grid.findMinEntropy.
+
+        Returns:
+            minEntropyCoords (tuple): Coorinates of the cell with the minimum entropy.
+        """
+        self.update()
+        while self.heap:
+            entropy, y, x, version = self.heap[0]
+            if version == self.versions[(x, y)]:
+                return (x, y)
+            heapq.heappop(self.heap)
+        return (0, 0)
+
+    def update(self):
+        """Pushes the new entropies of the changed cells.
+        """
+        for coords in self.changed:
+            version = self.versions.get(coords, 0) + 1
+            self.versions[coords] = version
+
+            # Defined cells are not pushed, so their outdated entries are skipped
+            cell = self.grid[coords]
+            if cell.isDefined():
+                continue
+
+            x, y = coords
+            entropy = cell.shannonEntropy()
+
+            # Add some noise to mix things up a little
+            if self.noise:
+                entropy = entropy - (self.noise * random.random() / 1000)
+
+            heapq.heappush(self.heap, (entropy, y, x, version))
+        self.changed.clear()
+
+        # Drop outdated entries, if they make up most of the heap
+        if len(self.heap) > 2 * len(self.versions) + 16:
+            self.heap = [entry for entry in self.heap if entry[3] == self.versions[(entry[2], entry[1])]]
+            heapq.heapify(self.heap)
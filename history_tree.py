@@ -1,16 +1,39 @@
 from anytree import NodeMixin
 
 class Move(object):  # Represents a single move
-    def __init__(self, x, y, letter, crossword):
+    def __init__(self, x, y, letter, crossword, mark=None, slot=None):
         self.x = x
         self.y = y
-        self.letter = letter
+        self.letter = letter  # Whole word for word moves
         self.crossword = crossword
+        self.mark = mark  # Trail position before the move, if the crossword is shared
+        self.slot = slot  # Coordinates of the word for word moves, None for letter moves
 
 class MoveNode(Move, NodeMixin):  # Add Node feature
-    def __init__(self, x, y, letter, crossword, parent=None, children=None):
-        super(MoveNode, self).__init__(x, y, letter, crossword)
+    def __init__(self, x, y, letter, crossword, parent=None, children=None, mark=None, slot=None):
+        super(MoveNode, self).__init__(x, y, letter, crossword, mark, slot)
         self.parent = parent
         if children:  # set children only if given
             self.children = children
 
+class PathNode(object):  # Move that only knows its parent, so reverted moves are freed
+    __slots__ = ("x", "y", "letter", "crossword", "mark", "slot", "parent")
+
+    def __init__(self, x, y, letter, crossword, parent=None, mark=None, slot=None):
+        self.x = x
+        self.y = y
+        self.letter = letter
+        self.crossword = crossword
+        self.mark = mark
+        self.slot = slot
+        self.parent = parent
+
+    @property
+    def path(self):
+        # Nodes from the root to this node, same as NodeMixin.path
+        node = self
+        nodes = []
+        while node is not None:
+            nodes.append(node)
+            node = node.parent
+        return tuple(reversed(nodes))
@@ -16,7 +16,8 @@ import random
 #random.seed(1234)
 
 size = (10,10)
-dict = dictionary.Dictionary("dictionary_HU.txt", validLetters=dictionary.lettersetHU)
+frameRate = 10
+dict = dictionary.Dictionary("dictionary_HU.txt", validLetters=dictionary.lettersetHU, cache=True)
 
 class MainApp(App):
     def build(self):
@@ -24,10 +25,11 @@ class MainApp(App):
 
         self.statusQueue = Queue()
         self.commandQueue = Queue()
+        self.cells = {}
 
         size = (10, 10)
         rootCrossword = crossword.Crossword(size, dict)
-        self.threadedSolver = ThreadedWFCSolver(rootCrossword, self.statusQueue, self.commandQueue)
+        self.threadedSolver = ThreadedWFCSolver(rootCrossword, self.statusQueue, self.commandQueue, frameRate=frameRate)
         self.threadedSolver.start()
     
         self._keyboard = Window.request_keyboard(self._keyboard_closed, None)
@@ -40,7 +42,7 @@ class MainApp(App):
 
     def start_display(self, *args):
         self.setCrosswordSize()
-        Clock.schedule_interval(self.update, 1.0/10.0)
+        Clock.schedule_interval(self.update, 1.0/frameRate)
 
     def _keyboard_closed(self):
         self._keyboard.unbind(on_key_down=self._on_keyboard_down)
@@ -104,23 +106,17 @@ class MainApp(App):
                 cell.state = "down"
 
     def update(self, dt):
-        try:
-            currentCrossword = self.statusQueue.get_nowait()
-            # Show current status
-            for cell in self.root.ids.grid.children:
-                try:
-                    coords = (int(cell.pos_x), int(cell.pos_y))
-                    crosswordCell = currentCrossword.grid[coords]
-                    defined = crosswordCell.isDefined()
-                    masked = crosswordCell.mask
-                    blocked = crosswordCell.blocked
-                    options = crosswordCell.options
-                    entropy = crosswordCell.shannonEntropy()
-                    cell.update(defined, masked, blocked, options, entropy)
-                except:
-                    pass
-        except Empty:
-            pass
+        # Snapshots only contain the changed cells, every one of them has to be applied
+        while True:
+            try:
+                snapshot = self.statusQueue.get_nowait()
+            except Empty:
+                break
+            for coords, letters, defined, masked, blocked, entropy in snapshot.cells():
+                cell = self.cells.get(coords)
+                # Snapshots of a grid of another size can still be queued after resizing
+                if cell is not None:
+                    cell.update(defined, masked, blocked, letters, entropy)
 
     def updateOptions(self):
         print("Updating")
@@ -151,11 +147,13 @@ class MainApp(App):
     
     def removeCells(self):
         self.root.ids.grid.clear_widgets()
+        self.cells = {}
     
     def addCells(self):
         for y in range(self.root.ids.height_input.current_value):
             for x in range(self.root.ids.width_input.current_value):
-                self.root.ids.grid.add_widget(Cell(x, y))
+                self.cells[(x, y)] = Cell(x, y)
+                self.root.ids.grid.add_widget(self.cells[(x, y)])
 
 if __name__ == "__main__":
     MainApp().run()
\ No newline at end of file
@@ -0,0 +1,196 @@
+import json
+import time
+
+class PhaseTimer(object):
+    """Context manager adding the time spent inside it to a timer of Metrics.
+    """
+    __slots__ = ("metrics", "name", "start")
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exception):
+        self.metrics.addTime(self.name, time.perf_counter() - self.start)
+        return False
+
+class Metrics(object):
+    """Counters and phase timers of the solver, and hooks for its events.
+
+    Counters and timers accumulate until reset. Listeners are called with the name and the fields of every event, e.g. to trace the moves of the solver.
+
+    Attributes:
+        counters (dict): Value of each counter.
+        timers (dict): Total seconds and number of measurements of each phase.
+        listeners (list of callables): Functions called with the name and the fields of each event.
+    """
+
+    def __init__(self, trace=False):
+        """Initializes empty metrics.
+
+        Arguments:
+            trace (bool) - optional: If True, every event is printed, see printEvent. (Default: False)
+        """
+        self.counters = {}
+        self.timers = {}
+        self.listeners = [printEvent] if trace else []
+
+    def __deepcopy__(self, memo):
+        # Copies of the crossword keep reporting to the same metrics
+        return self
+
+    def count(self, name, n=1):
+        """Increases a counter.
+
+        Arguments:
+            name (str): Name of the counter.
+            n (int) - optional: Amount to add. (Default: 1)
+        """
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def addTime(self, name, seconds):
+        """Adds a measurement to a phase timer.
+
+        Arguments:
+            name (str): Name of the phase.
+            seconds (float): Time spent in the phase.
+        """
+        timer = self.timers.get(name)
+        if timer is None:
+            self.timers[name] = [seconds, 1]
+        else:
+            timer[0] += seconds
+            timer[1] += 1
+
+    def time(self, name):
+        """Measures the time spent in a phase, to be used in a with statement.
+
+        Arguments:
+            name (str): Name of the phase.
+
+        Returns:
+            (PhaseTimer): Context manager of the measurement.
+        """
+        return PhaseTimer(self, name)
+
+    def event(self, name, **fields):
+        """Reports an event to every listener.
+
+        Arguments:
+            name (str): Name of the event.
+            fields - optional: Details of the event.
+        """
+        for listener in self.listeners:
+            listener(name, fields)
+
+    def addListener(self, listener):
+        """Registers a function to be called with the name and the fields of every event.
+
+        Arguments:
+            listener (callable): Function to register.
+        """
+        self.listeners.append(listener)
+
+    def reset(self):
+        """Clears every counter and timer. Listeners are kept.
+        """
+        self.counters = {}
+        self.timers = {}
+
+    def stats(self):
+        """Collects the counters and timers.
+
+        Returns:
+            (dict): Counters, and the total seconds and number of measurements of each phase.
+        """
+        return {
+            "counters": dict(self.counters),
+            "timers": {name: {"seconds": seconds, "count": count} for name, (seconds, count) in self.timers.items()},
+        }
+
+    def merge(self, stats):
+        """Adds the counters and timers of other metrics, e.g. of another process.
+
+        Arguments:
+            stats (dict): Metrics returned by stats.
+        """
+        for name, value in stats["counters"].items():
+            self.count(name, value)
+        for name, timer in stats["timers"].items():
+            if name in self.timers:
+                self.timers[name][0] += timer["seconds"]
+                self.timers[name][1] += timer["count"]
+            else:
+                self.timers[name] = [timer["seconds"], timer["count"]]
+
+    def toJSON(self, indent=None):
+        """Converts the metrics to JSON.
+
+        Arguments:
+            indent (int) - optional: Indentation of the output. (Default: Single line)
+
+        Returns:
+            (str): Metrics returned by stats, as JSON.
+        """
+        return json.dumps(self.stats(), indent=indent)
+
+    def toPrometheus(self, prefix="wfc"):
+        """Converts the metrics to the Prometheus text format. Counters are exported as "<prefix>_<name>_total", phases as "<prefix>_phase_seconds_total" and "<prefix>_phase_count_total" labeled with the phase.
+
+        Arguments:
+            prefix (str) - optional: Prefix of the metric names. (Default: "wfc")
+
+        Returns:
+            (str): Metrics in the Prometheus text format.
+        """
+        lines = []
+        for name in sorted(self.counters):
+            metric = "%s_%s_total" % (prefix, name)
+            lines.append("# TYPE %s counter" % metric)
+            lines.append("%s %d" % (metric, self.counters[name]))
+        if self.timers:
+            for metric, index in (("%s_phase_seconds_total" % prefix, 0), ("%s_phase_count_total" % prefix, 1)):
+                lines.append("# TYPE %s counter" % metric)
+                for name in sorted(self.timers):
+                    lines.append('%s{phase="%s"} %s' % (metric, name, repr(self.timers[name][index])))
+        return "\n".join(lines) + "\n"
+
+    def write(self, filename, format="json"):
+        """Writes the metrics to a file.
+
+        Arguments:
+            filename (str): Filename to write.
+            format (str) - optional: "json" or "prometheus". (Default: "json")
+        """
+        text = self.toPrometheus() if format == "prometheus" else self.toJSON(indent=2)
+        with open(filename, "w") as f:
+            f.write(text)
+
+# Line of the solver log for each reason of a stop event
+stopMessages = {"exhausted": "No more options", "time": "Time limit reached", "iterations": "Iteration limit reached", "command": "stop detected"}
+
+def printEvent(name, fields, file=None):
+    """Prints an event of the solver, in the format of the solver log.
+
+    Arguments:
+        name (str): Name of the event.
+        fields (dict): Details of the event.
+        file (file) - optional: Destination of the log. (Default: stdout)
+    """
+    if name == "decision":
+        print("letter added:   (", fields["x"], ",", fields["y"], "): ", fields["letter"]," - ",fields["level"], file=file)
+    elif name == "backtrack":
+        print("letter removed: (", fields["x"], ",", fields["y"], "): ", fields["letter"]," - ",fields["level"], file=file)
+    elif name == "propagation":
+        print("Updating options took: %.2gs and evaluated %d words" % (fields["seconds"], fields["slots"]), file=file)
+    elif name == "stop" and fields["reason"] in stopMessages:
+        print(stopMessages[fields["reason"]], file=file)
+    elif name == "finish":
+        print("%d updates in total." % fields["updates"], file=file)
+        print("Total time: %.2gs" % fields["seconds"], file=file)
+    else:
+        print(name, *("%s=%s" % item for item in fields.items()), file=file)
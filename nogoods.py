@@ -0,0 +1,77 @@
+from collections import OrderedDict
+
+class NogoodStore(object):
+    """Bounded store of learned nogoods. A nogood is a set of cell assignments, that can't all be part of a solution.
+    When every assignment of a nogood but one holds, the letter of the last one can be removed from its cell.
+
+    Attributes:
+        capacity (int): Maximum number of stored nogoods, the oldest ones are forgotten first.
+        maxLength (int): Longest nogood to store, longer ones rarely apply again.
+        nogoods (OrderedDict): Stored nogoods by their id, in order of learning.
+        watches (dict): Ids of the nogoods containing each assignment.
+        learned (int): Number of nogoods learned.
+        pruned (int): Number of letters removed by nogoods.
+    """
+
+    def __init__(self, capacity=10000, maxLength=16):
+        """Initializes an empty store.
+
+        Arguments:
+            capacity (int) - optional: Maximum number of stored nogoods. (Default: 10000)
+            maxLength (int) - optional: Longest nogood to store, None to store every length. (Default: 16)
+        """
+        self.capacity = capacity
+        self.maxLength = maxLength
+        self.nogoods = OrderedDict()
+        self.watches = {}
+        self.nextId = 0
+        self.learned = 0
+        self.pruned = 0
+
+    def __len__(self):
+        return len(self.nogoods)
+
+    def __deepcopy__(self, memo):
+        # Learned nogoods hold for every copy of the crossword, the store is shared
+        return self
+
+    def add(self, assignments):
+        """Stores a new nogood, forgetting the oldest one if the store is full.
+
+        Arguments:
+            assignments (iterable of tuples): Coordinates and letter of each assignment.
+        """
+        nogood = tuple(assignments)
+        if not nogood or (self.maxLength is not None and len(nogood) > self.maxLength):
+            return
+
+        self.nogoods[self.nextId] = nogood
+        for assignment in nogood:
+            self.watches.setdefault(assignment, set()).add(self.nextId)
+        self.nextId += 1
+        self.learned += 1
+
+        while len(self.nogoods) > self.capacity:
+            nogoodId, forgotten = self.nogoods.popitem(last=False)
+            for assignment in forgotten:
+                self.watches[assignment].discard(nogoodId)
+                if not self.watches[assignment]:
+                    del self.watches[assignment]
+
+    def involving(self, coords, letter):
+        """Collects the nogoods containing an assignment.
+
+        Arguments:
+            coords (tuple): Coordinates of the cell.
+            letter (char): Letter of the cell.
+
+        Returns:
+            (list of tuples): Matching nogoods.
+        """
+        return [self.nogoods[nogoodId] for nogoodId in self.watches.get((coords, letter), ())]
+
+    def clear(self):
+        """Forgets every nogood.
+        """
+        self.nogoods.clear()
+        self.watches.clear()
@@ -0,0 +1,144 @@
+import time
+from queue import Empty
+from typing import NamedTuple
+
+class Snapshot(NamedTuple):
+    """Immutable state of the changed cells of a crossword, so it can be read from another thread while the solver goes on.
+    The state of each cell is at the same position of every field.
+
+    Attributes:
+        version (int): Sequence number of the snapshot.
+        size (tuple): Width and height of the grid.
+        full (bool): True if every cell is included, e.g. after a reset, False if only the cells changed since the previous snapshot are.
+        coords (tuple of tuples): Coordinates of each included cell.
+        letters (tuple of strings): Allowed letters of each cell, most common first. A defined cell has its letter only.
+        defined (tuple of bools): True for each cell with a single letter or blocked.
+        masked (tuple of bools): True for each cell fixed by hand.
+        blocked (tuple of bools): True for each blocked cell.
+        entropies (tuple of floats): Entropy of each cell, 0 for defined cells.
+    """
+    version: int
+    size: tuple
+    full: bool
+    coords: tuple
+    letters: tuple
+    defined: tuple
+    masked: tuple
+    blocked: tuple
+    entropies: tuple
+
+    def cells(self):
+        """Iterates over the included cells.
+
+        Returns:
+            (generator of tuples): Coordinates, letters, defined, masked and blocked flags, and entropy of each cell.
+        """
+        return zip(self.coords, self.letters, self.defined, self.masked, self.blocked, self.entropies)
+
+def cellState(gridCell):
+    """Collects the displayed state of a cell.
+
+    Arguments:
+        gridCell (Cell): Cell of the grid.
+
+    Returns:
+        (tuple): Letters, defined, masked and blocked flags, and entropy, see Snapshot.
+    """
+    defined = gridCell.isDefined()
+    letters = gridCell.allowedLetters()
+    if len(letters) > 1:
+        letters = ''.join(sorted(letters, key=gridCell.getLetterCount, reverse=True))
+    entropy = 0.0 if defined or not letters else gridCell.shannonEntropy()
+    return (letters, defined, gridCell.mask, gridCell.blocked, entropy)
+
+class SnapshotPublisher(object):
+    """Publishes snapshots of a crossword to a queue, at most at a given frame rate. Each snapshot only contains the cells changed since the previous one.
+    Snapshots the reader did not pick up yet are merged into the next one, so the queue never holds more than one and no change is lost.
+
+    Attributes:
+        queue (Queue): Queue of the published snapshots.
+        frameRate (float): Maximum number of snapshots per second, None for no limit.
+        published (dict): Last published state of each cell by its coordinates, see cellState.
+        size (tuple): Size of the last published grid.
+        version (int): Sequence number of the last snapshot.
+        lastPublished (float): Time of the last snapshot, as returned by time.perf_counter().
+    """
+
+    def __init__(self, queue, frameRate=10):
+        """Initializes a new publisher.
+
+        Arguments:
+            queue (Queue): Queue of the published snapshots.
+            frameRate (float) - optional: Maximum number of snapshots per second, None for no limit. (Default: 10)
+        """
+        self.queue = queue
+        self.frameRate = frameRate
+        self.version = 0
+        self.invalidate()
+
+    def invalidate(self):
+        """Forgets the published state, so the next snapshot includes every cell.
+        """
+        self.published = {}
+        self.size = None
+        self.lastPublished = None
+
+    def isDue(self):
+        """Checks if the frame rate allows a new snapshot.
+
+        Returns:
+            (bool): True if a snapshot can be published.
+        """
+        if self.frameRate is None or self.lastPublished is None:
+            return True
+        return time.perf_counter() - self.lastPublished >= 1.0 / self.frameRate
+
+    def publish(self, crossword, force=False):
+        """Publishes the cells changed since the last snapshot, if the frame rate allows it.
+
+        Arguments:
+            crossword (Crossword): Crossword to publish, only read from the thread that changes it.
+            force (bool) - optional: If True, the frame rate is ignored, e.g. to show the final state of a search. (Default: False)
+
+        Returns:
+            (Snapshot): Published snapshot, None if it was not due or nothing changed.
+        """
+        if not force and not self.isDue():
+            return None
+        self.lastPublished = time.perf_counter()
+
+        grid = crossword.grid
+        size = (grid.width, grid.height)
+        full = size != self.size
+        if full:
+            self.published = {}
+            self.size = size
+
+        changes = {}
+        for y in range(grid.height):
+            for x in range(grid.width):
+                state = cellState(grid[(x, y)])
+                if self.published.get((x, y)) != state:
+                    changes[(x, y)] = state
+        self.published.update(changes)
+
+        # Changes the reader missed are sent again, unless they changed since
+        try:
+            pending = self.queue.get_nowait()
+        except Empty:
+            pending = None
+        if pending is not None and pending.size == size:
+            full = full or pending.full
+            for coords, *state in pending.cells():
+                if coords not in changes:
+                    changes[coords] = tuple(state)
+
+        if not changes and not full:
+            return None
+
+        self.version += 1
+        states = list(changes.values())
+        snapshot = Snapshot(self.version, size, full, tuple(changes),
+                            *(tuple(state[i] for state in states) for i in range(5)))
+        self.queue.put(snapshot)
+        return snapshot
@@ -5,69 +5,239 @@ import time
 from threading import Thread
 import queue
 from dictionary import Dictionary
+from metrics import Metrics
+from nogoods import NogoodStore
+from snapshot import SnapshotPublisher
+
+def luby(i):
+    """Returns the i-th element of the Luby sequence: 1, 1, 2, 1, 1, 2, 4, 1, 1, 2, ...
+
+    Arguments:
+        i (int): Index of the element, starting from 0.
+
+    Returns:
+        (int): Element of the sequence.
+    """
+    i += 1
+    while True:
+        k = i.bit_length()
+        if i == (1 << k) - 1:
+            return 1 << (k - 1)
+        i -= (1 << (k - 1)) - 1
 
 class WFCSolver(object):
-    def __init__(self, crossword):
+    def __init__(self, crossword, trail=False, trackEntropy=True, noise=None, prefix=(), learning=False, nogoodCapacity=10000,
+                 restarts=None, restartBase=100, restartFactor=1.5, keepLearned=True, keepTree=False,
+                 metrics=None, trace=False, engine="letter"):
+        """Initializes a new solver.
+
+        Arguments:
+            crossword (Crossword): Crossword to solve.
+            trail (bool): If True, the crossword is changed in place and moves are reverted from its trail, instead of keeping a copy for every move.
+            trackEntropy (bool): If True, the minimum entropy cell is kept in a heap, instead of checking every cell for every move.
+            noise (float): Level of noise mixed into the entropies when choosing the next cell, see Grid.findMinEntropy.
+            prefix (list of tuples): Moves made before the search as coordinates and letter, so only their subtree is searched, see splitFrontier.
+            learning (bool): If True, deadends are traced back to the decisions causing them. The solver jumps back to the latest of those, and remembers the combination as a nogood.
+            nogoodCapacity (int): Maximum number of learned nogoods kept, see NogoodStore.
+            restarts (str): Restart schedule, "luby" or "geometric". The search starts over from the root, once the backtracks since the last restart reach the budget of the schedule. None to never restart.
+            restartBase (int): Budget of backtracks before the first restart.
+            restartFactor (float): Growth of the budget after each restart, for the "geometric" schedule.
+            keepLearned (bool): If True, the letters and words blacklisted at the root and the learned nogoods are kept when restarting.
+            keepTree (bool): If True, every move tried is kept in a tree for debugging, see print_tree. Otherwise only the moves from the root to the current move are kept, so memory only grows with the depth.
+            metrics (Metrics): Counters, phase timers and event listeners of the solver. (Default: New metrics)
+            trace (bool): If True, every move and update is printed. Only used when no metrics are given.
+            engine (str): "letter" to decide a letter of the minimum entropy cell in every move, or "word" to decide a whole word of the slot with the fewest viable words. Cells outside of word slots are decided letter by letter in both cases.
+        """
+        self.trail = trail
+        self.trackEntropy = trackEntropy
+        self.noise = noise
+        self.prefix = list(prefix)
+        self.learning = learning
+        self.nogoodCapacity = nogoodCapacity
+        if restarts not in (None, "luby", "geometric"):
+            raise ValueError("Unknown restart schedule: %s" % restarts)
+        self.restarts = restarts
+        self.restartBase = restartBase
+        self.restartFactor = restartFactor
+        self.keepLearned = keepLearned
+        self.keepTree = keepTree
+        if engine not in ("letter", "word"):
+            raise ValueError("Unknown engine: %s" % engine)
+        self.engine = engine
+        self.metrics = metrics if metrics is not None else Metrics(trace)
         self.reset(crossword)
     
-    def reset(self, crossword=None):
+    def reset(self, crossword=None, nogoods=None):
+        """Starts the search over, from a reset crossword.
+
+        Arguments:
+            crossword (Crossword) - optional: Crossword to solve. (Default: Crossword of the current root)
+            nogoods (NogoodStore) - optional: Nogoods learned from the same root before. (Default: No nogoods)
+        """
         if crossword is None:
             crossword = self.root.crossword
+        crossword.metrics = self.metrics
         crossword.reset()
-        self.root = history_tree.MoveNode(0, 0, '-',  crossword, parent=None, children=None)
+        if self.trail:
+            crossword.enableTrail()
+        # Nogoods only hold for the root they were learned from, they are learned again
+        if self.learning:
+            crossword.enableLearning(nogoods if nogoods is not None else NogoodStore(self.nogoodCapacity))
+        else:
+            crossword.disableLearning()
+        if self.trackEntropy:
+            crossword.grid.trackEntropy(self.noise)
+        # Initial propagation, later updates only start from the changed cells
+        self.totalUpdates = crossword.updateOptions()
+        # Moves of the prefix are part of the root, they are never reverted
+        for coords, letter in self.prefix:
+            if crossword.grid.isDeadend():
+                break
+            crossword.saveCell(coords)
+            crossword.grid[coords].setLetter(letter)
+            self.totalUpdates += crossword.updateOptions([coords])
+        self.root = self.newNode(0, 0, '-', crossword)
         self.currentNode = self.root
         self.treelevel = 0
         self.i = 0
-        self.totalUpdates = 0
+        self.backtracks = 0
+        self.backjumps = 0
+        self.restartCount = 0
+        self.restartBacktracks = 0
+        self.restartLimit = self.restartBudget(0)
 
-    def solve(self):
-        """Runs iterations until the crossword is fully solved, or out of options.
+    def isSolved(self):
+        """Checks if the current crossword is fully defined and valid.
+
+        Returns:
+            (bool): True if the crossword is solved.
+        """
+        crossword = self.currentNode.crossword
+        with self.metrics.time("validation"):
+            return crossword.grid.isFullyDefined() and crossword.isFullyValid(incremental=True)
+
+    def isFailed(self):
+        """Checks if the current crossword is a deadend or has an invalid word, so the last move has to be reverted.
+
+        Returns:
+            (bool): True if the current move failed.
+        """
+        crossword = self.currentNode.crossword
+        with self.metrics.time("validation"):
+            return crossword.grid.isDeadend() or not crossword.isFullyValid(incremental=True)
+
+    def isExhausted(self):
+        """Checks if there are no more moves to try.
+
+        Returns:
+            (bool): True if the root of the search is a deadend or invalid.
+        """
+        crossword = self.currentNode.crossword
+        return self.currentNode == self.root and (crossword.grid.isDeadend() or not crossword.isFullyValid(incremental=True))
+
+    def solve(self, timeLimit=None, maxIterations=None, deadline=None):
+        """Runs iterations until the crossword is fully solved, out of options, or a limit is reached.
+
+        Arguments:
+            timeLimit (float) - optional: Maximum runtime in seconds. (Default: No limit)
+            maxIterations (int) - optional: Maximum number of iterations, counting the ones already done. (Default: No limit)
+            deadline (float) - optional: Wall-clock time to stop at, as returned by time.time(). (Default: No limit)
+
+        Returns:
+            (bool): True if the crossword is solved. Otherwise the reason of the stop is reported as a stop event, see Metrics.event.
         """
 
         startTime = time.perf_counter()
-        while not (self.currentNode.crossword.grid.isFullyDefined() and self.currentNode.crossword.isFullyValid()):
-            if self.currentNode == self.root and self.currentNode.crossword.grid.isDeadend():
-                print("No more options")
+        if deadline is not None:
+            # Both limits are checked on the same clock
+            remaining = deadline - time.time()
+            timeLimit = remaining if timeLimit is None else min(timeLimit, remaining)
+        solved = False
+        while True:
+            if self.isSolved():
+                solved = True
                 break
-            else:
-                self.iterate()
+            if self.isExhausted():
+                self.metrics.event("stop", reason="exhausted")
+                break
+            if timeLimit is not None and time.perf_counter() - startTime >= timeLimit:
+                self.metrics.event("stop", reason="time")
+                break
+            if maxIterations is not None and self.i >= maxIterations:
+                self.metrics.event("stop", reason="iterations")
+                break
+            if self.restartLimit is not None and self.backtracks - self.restartBacktracks >= self.restartLimit:
+                self.restart()
+                # The kept blacklists and nogoods can solve or exhaust the new root, check it again
+                continue
+            self.iterate()
         
         endTime = time.perf_counter()
-        print("%d updates in total." % self.totalUpdates)
-        print("Total time: %.2gs" % (endTime-startTime))
+        self.metrics.event("finish", updates=self.totalUpdates, seconds=endTime - startTime)
+        return solved
     
     def iterate(self):
         """Performs a single iteration of the Wavefunction Collapse
         Algorithm.
         """
         # Figure if we should move up or down the tree (new move or backtrack)
-        if self.currentNode.crossword.grid.isDeadend() or not self.currentNode.crossword.isFullyValid():
+        failed = self.isFailed()
+        if failed and self.currentNode is self.root:
+            # Nothing left to revert, the search is exhausted, see isExhausted
+            return
+
+        if failed and self.learning:
+            changedCoords = [self.backjump()]
+
+        elif failed:
             # Backtrack
-            self.treelevel -= 1
-            # Note the previous move
-            x = self.currentNode.x
-            y = self.currentNode.y
-            letter = self.currentNode.letter
-            print("letter removed: (", x, ",", y, "): ", letter," - ",self.treelevel)
+            self.backtracks += 1
+            self.metrics.count("backtracks")
             # Revert wrong move
-            self.currentNode = self.currentNode.parent
+            node = self.revertMove()
+            x, y, letter = node.x, node.y, node.letter
+            self.metrics.event("backtrack", x=x, y=y, letter=letter, level=self.treelevel)
             # Learn from the mistake
-            self.currentNode.crossword.grid[(x,y)].blacklist.append(letter)
+            self.blacklistMove(node)
+            changedCoords = [(x, y)]
 
         else:
             # New move
             self.treelevel += 1
-            # Find the coordinates of minimum entropy
-            x, y = self.currentNode.crossword.grid.findMinEntropy()
+            slot = None
+            if self.engine == "word":
+                # Find the slot with the fewest words
+                with self.metrics.time("selection"):
+                    slot, candidates = self.currentNode.crossword.findMostConstrainedSlot(self.noise)
+            if slot is None:
+                # Find the coordinates of minimum entropy
+                with self.metrics.time("entropy"):
+                    x, y = self.currentNode.crossword.grid.findMinEntropy(self.noise)
             # Collapse the wavefunction at these coordinates
-            new_matrix = deepcopy(self.currentNode.crossword) #TODO: optimize
-            letter = new_matrix.grid[(x,y)].define()
+            with self.metrics.time("copy"):
+                if self.trail:
+                    new_matrix = self.currentNode.crossword
+                    mark = new_matrix.pushLevel()
+                else:
+                    new_matrix = deepcopy(self.currentNode.crossword)
+                    mark = None
+            if slot is None:
+                new_matrix.saveCell((x,y))
+                letter = new_matrix.grid[(x,y)].define()
+                changedCoords = [(x, y)]
+            else:
+                letter = new_matrix.chooseWord(slot, candidates)
+                changedCoords = new_matrix.placeWord(slot, letter)
+                x, y = slot[0]
             # Make a note of move
-            self.currentNode = history_tree.MoveNode(x, y, letter, new_matrix, parent=self.currentNode)
-            print("letter added:   (", x, ",", y, "): ", letter," - ",self.treelevel)
+            for coords in changedCoords:
+                new_matrix.addReason(coords, 1 << self.treelevel)
+            self.currentNode = self.newNode(x, y, letter, new_matrix, parent=self.currentNode, mark=mark, slot=slot)
+            self.metrics.count("decisions")
+            self.metrics.event("decision", x=x, y=y, letter=letter, level=self.treelevel)
         
-        # Propagate changes, finish on a clean state
-        self.totalUpdates += self.currentNode.crossword.updateOptions()
+        # Propagate changes of the cells, finish on a clean state
+        self.totalUpdates += self.currentNode.crossword.updateOptions(changedCoords)
 
         self.i += 1
         #if self.i % 100 == 0:
@@ -75,28 +245,216 @@ class WFCSolver(object):
             #self.currentNode.crossword.printOptions()
             #print(self.currentNode.crossword.blacklist)
 
+    def newNode(self, x, y, letter, crossword, parent=None, mark=None, slot=None):
+        """Creates the node of a move, in the full tree if it is kept, otherwise only linked to its parent.
+
+        Arguments:
+            x (int): Column of the cell, the first cell of the slot for word moves.
+            y (int): Row of the cell, the first cell of the slot for word moves.
+            letter (char): Letter chosen for the cell, the whole word for word moves.
+            crossword (Crossword): Crossword after the move.
+            parent (Move) - optional: Node of the previous move. (Default: The node is a root)
+            mark (int) - optional: Trail position before the move, see Crossword.pushLevel. (Default: No trail)
+            slot (tuple of tuples) - optional: Coordinates of the letters of the word for word moves. (Default: Letter move)
+
+        Returns:
+            (Move): Node of the move.
+        """
+        if self.keepTree:
+            return history_tree.MoveNode(x, y, letter, crossword, parent=parent, mark=mark, slot=slot)
+        return history_tree.PathNode(x, y, letter, crossword, parent=parent, mark=mark, slot=slot)
+
+    def blacklistMove(self, node):
+        """Excludes a reverted move from the current crossword, the letter from its cell or the word from its slot.
+
+        Arguments:
+            node (Move): Node of the reverted move.
+        """
+        crossword = self.currentNode.crossword
+        crossword.saveCell((node.x, node.y))
+        if node.slot is None:
+            crossword.grid[(node.x, node.y)].blacklist.append(node.letter)
+        else:
+            crossword.blacklistWord(node.slot, node.letter)
+
+    def revertMove(self):
+        """Reverts the current move and steps back to its parent. The reverted node is dropped, or only its snapshot of the crossword is dropped if the full tree is kept.
+
+        Returns:
+            (Move): Node of the reverted move.
+        """
+        node = self.currentNode
+        if node is self.root:
+            raise ValueError("The root of the search can't be reverted")
+        if self.trail:
+            node.crossword.undoLevel(node.mark)
+        self.currentNode = node.parent
+        self.treelevel -= 1
+        node.crossword = None
+        return node
+
+    def restartBudget(self, restartCount):
+        """Returns the number of backtracks allowed before the next restart.
+
+        Arguments:
+            restartCount (int): Number of restarts so far.
+
+        Returns:
+            (int): Budget of backtracks, None if the solver never restarts.
+        """
+        if self.restarts == "luby":
+            return self.restartBase * luby(restartCount)
+        if self.restarts == "geometric":
+            return int(self.restartBase * self.restartFactor ** restartCount)
+        return None
+
+    def restart(self):
+        """Starts the search over from the root, with a larger budget of backtracks. The statistics of the run are kept.
+        If keepLearned is set, letters and words blacklisted at the root and learned nogoods are kept, as they hold for the whole search.
+        """
+        # Revert every move, the blacklists left are the ones of the root
+        while self.currentNode is not self.root:
+            self.revertMove()
+        crossword = self.root.crossword
+        blacklists = {gridCell.coords: list(gridCell.blacklist) for gridCell in crossword.grid if gridCell.blacklist}
+        wordBlacklists = dict(crossword.wordBlacklist)
+        nogoods = crossword.nogoods if self.keepLearned else None
+
+        statistics = (self.i, self.backtracks, self.backjumps, self.totalUpdates, self.restartCount + 1)
+        self.reset(nogoods=nogoods)
+        self.i, self.backtracks, self.backjumps, updates, self.restartCount = statistics
+        self.totalUpdates += updates
+        self.restartBacktracks = self.backtracks
+        self.restartLimit = self.restartBudget(self.restartCount)
+        self.metrics.count("restarts")
+        self.metrics.event("restart", budget=self.restartLimit)
+
+        if self.keepLearned and (blacklists or wordBlacklists):
+            for coords, blacklist in blacklists.items():
+                crossword.saveCell(coords)
+                crossword.grid[coords].blacklist.extend(blacklist)
+            crossword.wordBlacklist.update(wordBlacklists)
+            self.totalUpdates += crossword.updateOptions(list(blacklists) + [slot[0] for slot in wordBlacklists])
+
+    def backjump(self):
+        """Reverts every move up to the latest decision causing the current deadend, and blacklists the letter or word of that decision.
+        The decisions causing the deadend are learned as a nogood.
+
+        Returns:
+            coords (tuple): Coordinates of the blacklisted letter, the first cell of the slot for words.
+        """
+        crossword = self.currentNode.crossword
+        conflict = crossword.findConflict()
+        # Without any responsible decision, the root itself is a deadend, which is found by reverting the first level
+        target = max(conflict.bit_length() - 1, 1)
+
+        # Remember the combination of the responsible decisions
+        nogood = []
+        node = self.currentNode
+        for level in range(self.treelevel, 0, -1):
+            if conflict >> level & 1:
+                if node.slot is None:
+                    nogood.append(((node.x, node.y), node.letter))
+                else:
+                    nogood += zip(node.slot, node.letter)
+            node = node.parent
+        crossword.nogoods.add(nogood)
+        self.metrics.count("nogoods_learned")
+
+        if target < self.treelevel:
+            self.backjumps += 1
+            self.metrics.count("backjumps")
+            self.metrics.event("backjump", levels=self.treelevel - target)
+
+        # Revert the moves, the ones after the target are irrelevant to the deadend
+        while self.treelevel >= target:
+            node = self.revertMove()
+        x, y, letter = node.x, node.y, node.letter
+        self.backtracks += 1
+        self.metrics.count("backtracks")
+        self.metrics.event("backtrack", x=x, y=y, letter=letter, level=self.treelevel)
+
+        # Learn from the mistake, the other responsible decisions are the reason of the removal
+        self.blacklistMove(node)
+        self.currentNode.crossword.addReason((x,y), conflict & ~(1 << target))
+        return x, y
+
+    def splitFrontier(self, subtrees, maxDepth=None):
+        """Splits the search tree into disjoint subtrees, by enumerating every letter of the cells chosen on the first levels.
+        Levels are added until there are enough subtrees. Subtrees that are already exhausted or solved are not split further.
+        Searching every returned subtree covers the whole search tree of the solver.
+
+        Arguments:
+            subtrees (int): Minimum number of subtrees to return, if the tree is large enough.
+            maxDepth (int) - optional: Maximum number of levels to split. (Default: No limit)
+
+        Returns:
+            frontier (list of lists): Prefix of each subtree, as the coordinates and letter of its moves.
+        """
+        prefix = self.prefix
+        frontier = [prefix]
+        depth = 0
+        while len(frontier) < subtrees and (maxDepth is None or depth < maxDepth):
+            nextFrontier = []
+            split = False
+            for movePrefix in frontier:
+                self.prefix = movePrefix
+                self.reset()
+                grid = self.root.crossword.grid
+                if self.isExhausted() or grid.isFullyDefined():
+                    nextFrontier.append(movePrefix)
+                    continue
+                coords = grid.findMinEntropy(self.noise)
+                nextFrontier += [movePrefix + [(coords, letter)] for letter in grid[coords].allowedLetters()]
+                split = True
+            frontier = nextFrontier
+            depth += 1
+            if not split:
+                break
+
+        self.prefix = prefix
+        self.reset()
+        return frontier
+
     def print_tree(self):
+        if not self.keepTree:
+            # Only the current path is known
+            for depth, node in enumerate(self.currentNode.path):
+                print((u"%s%s%s%s" % ("  " * depth, node.x, node.y, node.letter)).ljust(8))
+            return
         for pre, _, node in RenderTree(self.root):
             treestr = u"%s%s%s%s" % (pre, node.x, node.y, node.letter)
             print(treestr.ljust(8))
 
 class ThreadedWFCSolver(WFCSolver, Thread):
-    def __init__(self, crossword, statusQueue, commandQueue):
+    def __init__(self, crossword, statusQueue, commandQueue, frameRate=10, **kwargs):
+        """Initializes a new solver running on its own thread.
+
+        Arguments:
+            crossword (Crossword): Crossword to solve.
+            statusQueue (Queue): Queue of the snapshots of the crossword, see SnapshotPublisher.
+            commandQueue (Queue): Queue of the functions to run on the thread, with their arguments.
+            frameRate (float) - optional: Maximum number of snapshots per second while solving. (Default: 10)
+            kwargs - optional: Keyword arguments of WFCSolver.
+        """
         self.statusQueue = statusQueue
         self.commandQueue = commandQueue
         self.timeout = 1.0 / 10.0
-        WFCSolver.__init__(self, crossword)
+        # The crossword is only read on this thread, the UI gets immutable snapshots
+        self.publisher = SnapshotPublisher(statusQueue, frameRate)
+        WFCSolver.__init__(self, crossword, **kwargs)
         Thread.__init__(self)
         self.daemon = True
         
         self.updateStatus()
     
-    def updateStatus(self):
-        # Remove all previous statuses
-        while not self.statusQueue.empty():
-            self.statusQueue.get_nowait()
-        # Place current status
-        self.statusQueue.put(self.currentNode.crossword)
+    def updateStatus(self, force=True):
+        """Publishes the cells changed since the last snapshot.
+
+        Arguments:
+            force (bool) - optional: If False, the snapshot is skipped unless the frame rate allows it. (Default: True)
+        """
+        self.publisher.publish(self.currentNode.crossword, force)
     
     def onThread(self, function, *args, **kwargs):
         self.commandQueue.put((function, args, kwargs))
@@ -105,7 +463,7 @@ class ThreadedWFCSolver(WFCSolver, Thread):
         while True:
             try:
                 function, args, kwargs = self.commandQueue.get(timeout=self.timeout)
-                print(function, args, kwargs)
+                self.metrics.event("command", function=getattr(function, "__name__", function), args=args, kwargs=kwargs)
                 function(*args, **kwargs)
             except queue.Empty:
                 self.idle()
@@ -122,24 +480,27 @@ class ThreadedWFCSolver(WFCSolver, Thread):
             try:
                 function, args, kwargs = self.commandQueue.get_nowait()
                 if function == self.stop:
-                    print("stop detected")
+                    self.metrics.event("stop", reason="command")
                     break
                 else:
-                    print("can't stop, won't stop")
+                    # Other commands are dropped while searching
+                    self.metrics.event("ignored", function=getattr(function, "__name__", function))
             except queue.Empty:
                 if self.currentNode == self.root and self.currentNode.crossword.grid.isDeadend():
-                    print("No more options")
+                    self.metrics.event("stop", reason="exhausted")
                     break
                 else:
                     self.iterate()
+        # Show where the search stopped, even if its last frame was skipped
+        self.updateStatus()
 
     def stop(self):
         pass
 
-    def reset(self, crossword=None):
-        WFCSolver.reset(self, crossword)
+    def reset(self, crossword=None, nogoods=None):
+        WFCSolver.reset(self, crossword, nogoods)
         self.updateStatus()
     
     def iterate(self):
         WFCSolver.iterate(self)
-        self.updateStatus()
\ No newline at end of file
+        self.updateStatus(force=False)
\ No newline at end of file